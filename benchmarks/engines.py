@@ -0,0 +1,49 @@
+from http import HTTPStatus
+import argparse
+import time
+
+from web_tester import model
+from web_tester.controller import Controller
+
+from .server import StandInServer
+
+
+def make_model(url: str, endpoints: int, fuzz_count: int, engine: model.Engine, max_in_flight: int) -> model.Model:
+    ret = model.Model([], [], None, model.RunOptions(engine, max_in_flight))
+    for i in range(endpoints):
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.JSON, '{"name": "value", "id": 1}')
+        response = model.HTTPResponse(HTTPStatus.OK, model.ResponseBodyType.JSON)
+        ret.add_endpoint(model.Endpoint(f"{url}endpoint/{i}", model.Interaction(request, response), fuzz_test=model.FuzzTest(fuzz_count)))
+    return ret
+
+
+def run(url: str, args, engine: model.Engine) -> float:
+    controller = Controller(make_model(url, args.endpoints, args.fuzz_count, engine, args.max_in_flight))
+
+    start = time.perf_counter()
+    if engine == model.Engine.ASYNCIO:
+        controller.run_async_tests()
+    else:
+        controller.run_default_tests()
+    elapsed = time.perf_counter() - start
+
+    count = len(controller.model.results)
+    controller.cleanup()
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare thread and asyncio engine throughput")
+    parser.add_argument("--endpoints", type=int, default=10)
+    parser.add_argument("--fuzz-count", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="server side latency per request in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    args = parser.parse_args()
+
+    with StandInServer(args.latency) as server:
+        for engine in model.Engine:
+            print(f"{engine}: {run(server.url(), args, engine):.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import subprocess
+import sys
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(any(map(lambda name: name.startswith("imgui_bundle"), sys.modules)))
+"""
+
+
+def measure(module: str) -> (float, bool):
+    # fresh interpreter every time so nothing is cached in sys.modules
+    output = subprocess.run([sys.executable, "-c", SCRIPT.format(module=module)],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), output[1] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard cold start import time of the core modules")
+    parser.add_argument("--module", default="web_tester.controller")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=500, help="fail if best import time is above this")
+    args = parser.parse_args()
+
+    times = []
+    gui_loaded = False
+    for i in range(args.repeat):
+        elapsed, gui = measure(args.module)
+        times.append(elapsed)
+        gui_loaded |= gui
+
+    best = min(times) * 1000
+    print(f"import {args.module}: best {best:.1f}ms, worst {max(times) * 1000:.1f}ms over {args.repeat} runs")
+
+    failed = False
+    if gui_loaded:
+        print(f"{args.module} imports imgui_bundle", file=sys.stderr)
+        failed = True
+    if best > args.max_ms:
+        print(f"import time above budget of {args.max_ms}ms", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
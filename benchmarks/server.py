@@ -0,0 +1,108 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import multiprocessing
+import random
+import threading
+import time
+
+
+def make_body(body_type: str, size: int) -> bytes:
+    if body_type == "html":
+        row = "<div class=\"row\"><p>lorem ipsum dolor sit amet</p></div>\n"
+        return f"<html><body>\n{row * max(0, (size - 30) // len(row))}</body></html>".encode()
+
+    items = []
+    body = {"status": "ok"}
+    while size > 0 and len(json.dumps(body)) < size:
+        items.append({"id": len(items), "name": "lorem ipsum", "value": 0.5, "tags": ["dolor", "sit"]})
+        body = {"status": "ok", "items": items}
+    return json.dumps(body).encode()
+
+
+ERROR_BODY = b"<html><body><h1>Internal Server Error</h1><p>Fatal error: Uncaught exception in /var/www/index.php</p></body></html>"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > 0:
+            self.rfile.read(length)
+
+        time.sleep(self.server.latency)
+
+        status, content_type, body = 200, self.server.content_type, self.server.body
+        if self.server.error_rate > 0 and self.server.random.random() < self.server.error_rate:
+            status, content_type, body = 500, "text/html", ERROR_BODY
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=stand-in")
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+    do_PUT = respond
+    do_DELETE = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    # error_rate is the share of requests answered with 500 and an error page the wordlist catches
+    daemon_threads = True
+    request_queue_size = 4096
+
+    def __init__(self, latency: float = 0, port: int = 0, body_size: int = 0, body_type: str = "json",
+                 error_rate: float = 0, seed: int = 0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.body = make_body(body_type, body_size)
+        self.content_type = "text/html" if body_type == "html" else "application/json"
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def url(self, path: str = "/") -> str:
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+
+
+def serve(ports: multiprocessing.Queue, stop: multiprocessing.Event, kwargs: dict):
+    with StandInServer(**kwargs) as server:
+        ports.put(server.server_port)
+        stop.wait()
+
+
+class StandInProcess:
+    # same server in a child process, so its CPU time doesn't count towards the measured process
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.port = None
+
+    def url(self, path: str = "/") -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def __enter__(self):
+        ports = multiprocessing.Queue()
+        self.stop = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=serve, args=(ports, self.stop, self.kwargs), daemon=True)
+        self.process.start()
+        self.port = ports.get(timeout=10)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop.set()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
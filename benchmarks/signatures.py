@@ -0,0 +1,52 @@
+import argparse
+import random
+import re
+import string
+import timeit
+
+from web_tester.signatures import SignatureMatcher
+
+
+def legacy_match(errors: str, text: str) -> bool:
+    # controller.match_errors before the precompiled matcher
+    return re.search(f"\\b({errors})\\b", text) is not None
+
+
+def make_body(size: int) -> str:
+    words = ["<div>", "</div>", "<p>", "</p>", "lorem", "ipsum", "dolor", "sit", "amet", "value", "class=\"row\"", "\n"]
+    ret = []
+    length = 0
+    while length < size:
+        word = random.choice(words)
+        ret.append(word)
+        length += len(word) + 1
+    return ' '.join(ret)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare error signature matching against the old regex alternation")
+    parser.add_argument("--wordlist", default="./fuzzdb/regex/errors.txt")
+    parser.add_argument("--size", type=int, default=300_000, help="response body size in characters")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.wordlist, "r") as file:
+        lines = file.readlines()
+
+    errors = '|'.join(map(lambda s: f"({re.escape(s.strip())})", lines))
+    matcher = SignatureMatcher(lines)
+
+    random.seed(0)
+    clean = make_body(args.size)
+    dirty = clean + " " + random.choice(matcher.signatures) + " " + ''.join(random.choices(string.ascii_letters, k=16))
+
+    for name, text in [("clean", clean), ("with error at end", dirty)]:
+        assert legacy_match(errors, text) == matcher.matches(text)
+
+        legacy = timeit.timeit(lambda: legacy_match(errors, text), number=args.repeat) / args.repeat
+        current = timeit.timeit(lambda: matcher.matches(text), number=args.repeat) / args.repeat
+        print(f"{name} ({len(text)} chars): legacy {legacy * 1000:.2f}ms, matcher {current * 1000:.2f}ms, {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+from copy import deepcopy
+from http import HTTPStatus
+import argparse
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import requests
+
+from web_tester import model
+from web_tester.controller import Controller, match_errors, response_convert
+from web_tester.payloads import PayloadGenerator, fuzz_json, make_payload, payload_source, apply_payload
+
+from .server import StandInProcess
+
+# (name, metric, True if bigger is better)
+METRICS = [("ops_per_second", "ops/s", True), ("cpu_per_op", "CPU/op", False), ("peak_memory", "peak memory", False),
+           ("memory_per_op", "memory/op", False)]
+
+JSON_TEMPLATE = {
+    "user": {"name": "lorem", "email": "lorem@example.com", "age": 30, "admin": False,
+             "address": {"street": "ipsum", "city": "dolor", "zip": "12345"}},
+    "items": [{"id": i, "price": 2.5, "name": "sit amet", "active": True} for i in range(5)],
+    "comment": "consectetur adipiscing elit",
+}
+
+
+def make_model(url: str, args, dynamic: bool = False, engine: model.Engine = model.Engine.THREADS) -> model.Model:
+    dynamic_options = model.DynamicTestingOptions(False, model.PartialDictionary(), args.virtual_users) if dynamic else None
+    ret = model.Model([], [], dynamic_options,
+                      model.RunOptions(engine, payload_processes=args.payload_processes, result_database=args.result_database))
+    for i in range(args.endpoints):
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.JSON, json.dumps(JSON_TEMPLATE))
+        response = model.HTTPResponse(HTTPStatus.OK, model.ResponseBodyType.JSON if args.body_type == "json" else model.ResponseBodyType.HTML)
+        ret.add_endpoint(model.Endpoint(f"{url}endpoint/{i}", model.Interaction(request, response),
+                                        fuzz_test=model.FuzzTest(args.fuzz_count)))
+    return ret
+
+
+def run_controller(test_model: model.Model, args, run) -> int:
+    controller = Controller(test_model, args.workers)
+    run(controller)
+    controller.cleanup()
+    return len(test_model.results)
+
+
+def default_tests(server, args) -> int:
+    return run_controller(make_model(server.url(), args), args, Controller.run_default_tests)
+
+
+def async_tests(server, args) -> int:
+    return run_controller(make_model(server.url(), args, engine=model.Engine.ASYNCIO), args, Controller.run_async_tests)
+
+
+def dynamic_tests(server, args) -> int:
+    return run_controller(make_model(server.url(), args, dynamic=True), args, Controller.run_dynamic_tests)
+
+
+def fetch_responses(server, count: int) -> list[requests.Response]:
+    with requests.Session() as session:
+        return [session.get(server.url(f"/sample/{i}")) for i in range(count)]
+
+
+def response_convert_case(responses: list[requests.Response]):
+    def run(server, args) -> int:
+        for i in range(args.iterations):
+            response_convert(responses[i % len(responses)])
+        return args.iterations
+    return run
+
+
+def match_errors_case(bodies: list[str]):
+    def run(server, args) -> int:
+        for i in range(args.iterations):
+            match_errors(bodies[i % len(bodies)])
+        return args.iterations
+    return run
+
+
+def fuzz_json_case(server, args) -> int:
+    for i in range(args.iterations):
+        fuzz_json(JSON_TEMPLATE)
+    return args.iterations
+
+
+def fuzz_payloads(server, args) -> int:  # generation alone, separate from request throughput
+    endpoints = make_model(server.url(), args).endpoints
+    generator = PayloadGenerator(args.payload_processes)
+    for endpoint in endpoints:
+        generator.add(endpoint, args.iterations)
+    generator.start()
+
+    count = 0
+    for endpoint in endpoints:
+        while generator.get(endpoint)[1] is not None:  # only the seed once all were generated
+            count += 1
+    generator.close()
+    return count
+
+
+def result_memory_case(responses: list[requests.Response]):
+    # results as a fuzz run keeps them, memory of the log is what the peak measures
+    def run(server, args) -> int:
+        endpoint = make_model(server.url(), args).endpoints[0]
+        source = payload_source(endpoint.interaction.request)
+        results = model.ResultLog()
+        for i in range(args.iterations):
+            request = deepcopy(endpoint.interaction.request)
+            apply_payload(request, make_payload(request.body_type, source))
+            response = responses[i % len(responses)]
+            results.append(model.TestResult(endpoint, model.Severity.OK, "Got expected response", response.elapsed,
+                                            request, response_convert(response), test_type=model.TestType.FUZZ))
+        return len(results)
+    return run
+
+
+def measure(fn, server, args) -> dict:
+    gc.collect()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    ops = fn(server, args)
+    cpu = time.process_time() - cpu_start
+    elapsed = time.perf_counter() - start
+
+    # second pass for memory, tracing would skew the timings above
+    gc.collect()
+    tracemalloc.start()
+    fn(server, args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "ops": ops,
+        "seconds": elapsed,
+        "ops_per_second": ops / elapsed if elapsed > 0 else 0,
+        "cpu_per_op": cpu / ops if ops > 0 else 0,
+        "peak_memory": peak,
+        "memory_per_op": peak / ops if ops > 0 else 0,
+    }
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def parameters(args) -> dict:  # runs are only compared with runs of same parameters
+    return {k: v for k, v in vars(args).items() if k not in ["store", "threshold", "cases", "fail_on_regression"]}
+
+
+def previous_record(filename: str, params: dict) -> dict:
+    ret = None
+    try:
+        with open(filename, "r") as file:
+            for line in file:
+                record = json.loads(line)
+                if record["parameters"] == params:
+                    ret = record
+    except FileNotFoundError:
+        pass
+    return ret
+
+
+def format_value(metric: str, value: float) -> str:
+    if metric == "cpu_per_op":
+        return f"{value * 1000000:.1f}µs"
+    if metric == "peak_memory":
+        return f"{value / 1024:.0f}KiB"
+    if metric == "memory_per_op":
+        return f"{value / 1024:.1f}KiB"
+    return f"{value:.1f}"
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list[str]:  # returns regressions
+    regressions = []
+    for name, result in current.items():
+        if name not in previous:
+            continue
+        for metric, title, bigger_is_better in METRICS:
+            if metric not in previous[name] or metric not in result:  # recorded before the metric existed
+                continue
+            old, new = previous[name][metric], result[metric]
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            if (-change if bigger_is_better else change) > threshold:
+                regressions.append(f"{name}: {title} {format_value(metric, old)} -> {format_value(metric, new)} ({change * 100:+.0f}%)")
+    return regressions
+
+
+CASES = ["default_tests", "async_tests", "dynamic_tests", "response_convert", "match_errors", "fuzz_json", "fuzz_payloads", "result_memory"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the controller against a local stand-in server and keep history")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--endpoints", type=int, default=5)
+    parser.add_argument("--fuzz-count", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=1000, help="calls for the cases without requests")
+    parser.add_argument("--payload-processes", type=int, default=0, help="processes generating fuzz payloads")
+    parser.add_argument("--virtual-users", type=int, default=1, help="parallel users of the dynamic tests case")
+    parser.add_argument("--result-database", default="", help="write results of the request cases to this SQLite file")
+    parser.add_argument("--latency", type=float, default=0.005, help="server side latency per request in seconds")
+    parser.add_argument("--body-size", type=int, default=16 * 1024, help="response body size in bytes")
+    parser.add_argument("--body-type", choices=["json", "html"], default="json")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of responses that are 500 with an error page")
+    parser.add_argument("--store", default=os.path.join(os.path.dirname(__file__), "results.jsonl"),
+                        help="append results to this file and compare with the last run with same parameters")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with 1 when a regression was found")
+    args = parser.parse_args()
+
+    logging.getLogger("web_tester").setLevel(logging.ERROR)  # injected errors are expected
+
+    results = {}
+    with StandInProcess(latency=args.latency, body_size=args.body_size, body_type=args.body_type,
+                        error_rate=args.error_rate) as server:
+        responses = fetch_responses(server, 50)
+        cases = {
+            "default_tests": default_tests,
+            "async_tests": async_tests,
+            "dynamic_tests": dynamic_tests,
+            "response_convert": response_convert_case(responses),
+            "match_errors": match_errors_case([r.text for r in responses]),
+            "fuzz_json": fuzz_json_case,
+            "fuzz_payloads": fuzz_payloads,
+            "result_memory": result_memory_case(responses),
+        }
+
+        for name in args.cases:
+            results[name] = measure(cases[name], server, args)
+            result = results[name]
+            print(f"{name}: {result['ops']} ops in {result['seconds']:.2f}s, {format_value('ops_per_second', result['ops_per_second'])} ops/s, "
+                  f"{format_value('cpu_per_op', result['cpu_per_op'])} CPU/op, {format_value('peak_memory', result['peak_memory'])} peak, "
+                  f"{format_value('memory_per_op', result['memory_per_op'])}/op")
+
+    params = parameters(args)
+    previous = previous_record(args.store, params)
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": revision(),
+        "python": platform.python_version(),
+        "parameters": params,
+        "results": results,
+    }
+    with open(args.store, "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+    if previous is None:
+        print(f"No previous run with same parameters in {args.store}")
+        return 0
+
+    regressions = compare(previous["results"], results, args.threshold)
+    print(f"Compared with {previous['revision']} ({previous['time']}): {len(regressions)} regressions")
+    for line in regressions:
+        print(f"  {line}")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,20 @@
 import unittest
 from .controller import TestController
-from .model import TestPartialDict
+from .model import TestPartialDict, TestResultLog
+from .sessions import TestSessionPool
+from .async_engine import TestAsyncEngine
+from .signatures import TestSignatureMatcher
+from .cli import TestCli
+from .logs import TestLogs
+from .scheduler import TestScheduler, TestAdaptiveLimit
+from .metrics import TestLatencyHistogram
+from .benchmarks import TestBenchmarkSuite
+from .payloads import TestPayloadGenerator, TestJsonTemplate
+from .streaming import TestStreaming
+from .decoding import TestDecoding
+from .result_store import TestResultStore
+from .project import TestProject
+from .wordlists import TestMappedWordlist, TestWordlistCache
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from http import HTTPStatus
+
+from web_tester import model
+from web_tester.controller import Controller
+from benchmarks.server import StandInServer
+
+
+class TestAsyncEngine(unittest.TestCase):
+    def run_engine(self, url: str, engine: model.Engine) -> list:
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.FORM_DATA, model.PartialDictionary.from_dict({"a": "b"}))
+        endpoints = [model.Endpoint(u, model.Interaction(request, model.HTTPResponse(HTTPStatus.OK, model.ResponseBodyType.JSON)), fuzz_test=model.FuzzTest(3))
+                     for u in [url, "http://127.0.0.1:1/"]]
+
+        controller = Controller(model.Model(endpoints, [], None, model.RunOptions(engine)))
+        if engine == model.Engine.ASYNCIO:
+            controller.run_async_tests()
+        else:
+            controller.run_default_tests()
+        controller.cleanup()
+
+        return sorted((r.endpoint.url, r.severity.value, r.verdict, type(r.error), r.response and r.response.body) for r in controller.model.results)
+
+    def test_same_results(self):
+        with StandInServer() as server:
+            threads = self.run_engine(server.url(), model.Engine.THREADS)
+            asyncio = self.run_engine(server.url(), model.Engine.ASYNCIO)
+
+        self.assertEqual(len(threads), 8)
+        self.assertEqual(threads, asyncio)
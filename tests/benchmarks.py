@@ -0,0 +1,27 @@
+import unittest
+import requests
+
+from web_tester.controller import match_errors
+from benchmarks.server import StandInServer
+from benchmarks.suite import compare
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_stand_in_server(self):
+        with StandInServer(body_size=4096, body_type="html") as server:
+            response = requests.get(server.url())
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(response.content), 4000)
+            self.assertFalse(match_errors(response.text))
+
+        with StandInServer(error_rate=1) as server:
+            response = requests.get(server.url())
+            self.assertEqual(response.status_code, 500)
+            self.assertTrue(match_errors(response.text))
+
+    def test_compare(self):
+        previous = {"case": {"ops_per_second": 100, "cpu_per_op": 0.01, "peak_memory": 1000}}
+        current = {"case": {"ops_per_second": 80, "cpu_per_op": 0.0105, "peak_memory": 500}, "new": {}}
+        regressions = compare(previous, current, 0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("ops/s", regressions[0])
@@ -0,0 +1,27 @@
+import unittest
+import tempfile
+import json
+import os
+from http import HTTPStatus
+
+from web_tester import cli, model
+from web_tester.project import save_project
+
+
+class TestCli(unittest.TestCase):
+    def test_run_project(self):
+        endpoint = model.Endpoint("http://127.0.0.1:1/", model.Interaction(model.HTTPRequest(model.HTTPType.GET), model.HTTPResponse(HTTPStatus.OK)),
+                                  fuzz_test=model.FuzzTest(2))
+
+        with tempfile.TemporaryDirectory() as directory:
+            project = os.path.join(directory, "project.wt")
+            output = os.path.join(directory, "results.json")
+            save_project(model.Model([endpoint], []), project)
+
+            self.assertEqual(cli.main(["run", project, "--fail-on", "warning"]), 1)
+            self.assertEqual(cli.main(["run", project, "--fail-on", "danger", "-o", output]), 0)
+
+            with open(output) as file:
+                results = json.load(file)
+            self.assertEqual(results["summary"]["severity"]["WARNING"], 3)
+            self.assertEqual(len(results["results"]), 3)
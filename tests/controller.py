@@ -1,5 +1,9 @@
 import unittest
-from web_tester import controller
+import time
+from http import HTTPStatus
+
+from web_tester import controller, model
+from benchmarks.server import StandInServer
 
 
 class TestController(unittest.TestCase):
@@ -7,3 +11,122 @@ class TestController(unittest.TestCase):
         self.assertFalse(controller.match_errors("Successfully processed input!!!!!!"))
         self.assertTrue(controller.match_errors("Died on line 64"))
         self.assertTrue(controller.match_errors("Fatal error: server cannot be a teapot"))
+
+    def test_results_stream_into_filter(self):
+        ctrl = controller.Controller(model.Model([], []))
+        ctrl.set_result_filter(model.TestResultFilter(None, None, model.Severity.DANGER.value))
+
+        endpoint = model.Endpoint.default()
+        ctrl.model.results.append(model.TestResult(endpoint, model.Severity.OK, "ok", None))
+        ctrl.model.results.append(model.TestResult(endpoint, model.Severity.CRITICAL, "critical", None))
+        self.assertEqual(list(map(lambda tr: tr.verdict, ctrl.test_results())), ["critical"])
+
+        ctrl.model.results.append(model.TestResult(endpoint, model.Severity.DANGER, "danger", None))
+        self.assertEqual(list(map(lambda tr: tr.verdict, ctrl.test_results())), ["critical", "danger"])
+
+    def test_classify_body(self):
+        json_type, html_type = model.ResponseBodyType.JSON, model.ResponseBodyType.HTML
+        self.assertEqual(controller.classify_body("text/html", ' \n {"a": 1}'), json_type)
+        self.assertEqual(controller.classify_body("", "[1, 2]"), json_type)
+        self.assertEqual(controller.classify_body("application/json; charset=utf-8", '"ok"'), json_type)
+        self.assertEqual(controller.classify_body("application/json", ""), html_type)
+        self.assertEqual(controller.classify_body("text/html", "<html></html>"), html_type)
+
+    def test_confirm_body_type(self):
+        json_type, html_type = model.ResponseBodyType.JSON, model.ResponseBodyType.HTML
+        for content_type, body, expected in [("application/json", '{"a": 1}', json_type), ("text/html", "[1, 2", html_type),
+                                             ("application/json", "<html>502 Bad Gateway</html>", html_type),
+                                             ("text/html", "<p>hi</p>", html_type)]:
+            response = model.HTTPResponse(200, controller.classify_body(content_type, body), body)
+            self.assertEqual(controller.confirm_body_type(response), expected, body)
+            self.assertEqual(response.body_type, expected)
+
+        response = model.HTTPResponse(200, json_type, '{"a": [1, 2', truncated=True)  # only a prefix, the sniff stands
+        self.assertEqual(controller.confirm_body_type(response), json_type)
+
+    def test_json_bodies_compared_parsed(self):
+        expected = model.HTTPResponse(200, model.ResponseBodyType.JSON, '{\n    "a": 1,\n    "b": [1, 2]\n}')
+        received = model.HTTPResponse(200, model.ResponseBodyType.JSON, '{"b":[1,2],"a":1}')
+        self.assertTrue(controller.bodies_equal(expected, received))
+
+        received = model.HTTPResponse(200, model.ResponseBodyType.JSON, '{"b":[1,2],"a":2}')
+        self.assertFalse(controller.bodies_equal(expected, received))
+
+    def seeded_run(self, url: str, seed: int) -> controller.Controller:
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.JSON, '{"name": "a", "id": 1}')
+        endpoints = [model.Endpoint(u, model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)), fuzz_test=model.FuzzTest(4))
+                     for u in [url, "http://127.0.0.1:1/"]]
+        for endpoint in endpoints:
+            endpoint.match_test = False  # no payload, no seed
+        ctrl = controller.Controller(model.Model(endpoints, [], None, model.RunOptions(seed=seed)))
+        ctrl.run_default_tests()
+        return ctrl
+
+    def test_seeded_runs_replay(self):
+        def requests(ctrl):
+            return sorted((r.endpoint.url, r.seed, r.diff_request.get_body()) for r in ctrl.model.results)
+
+        with StandInServer() as server:
+            first, second = self.seeded_run(server.url(), 5), self.seeded_run(server.url(), 5)
+            self.assertEqual(requests(first), requests(second))
+            self.assertNotEqual(requests(first), requests(self.seeded_run(server.url(), 6)))
+
+            failed = first.failures(model.Severity.WARNING)
+            self.assertEqual(len(failed), 4)  # refused connections only
+            first.replay_failures(model.Severity.WARNING)
+            self.assertEqual(requests(first), sorted((r.endpoint.url, r.seed, r.diff_request.get_body()) for r in failed))
+            first.cleanup()
+            second.cleanup()
+
+    def test_incremental_runs(self):
+        with StandInServer() as server:
+            ctrl = self.seeded_run(server.url(), 0)
+            ok, refused = ctrl.model.endpoints
+            ctrl.model.run_options.incremental = True
+
+            def runs():
+                ctrl.run_default_tests()
+                return sorted(set((r.endpoint.url, r.run) for r in ctrl.model.results))
+
+            self.assertEqual(runs(), [(refused.url, 2), (ok.url, 1)])  # unchanged and passed
+            ok.fuzz_test.count = 2
+            self.assertEqual(runs(), [(refused.url, 3), (ok.url, 3)])
+            self.assertEqual(len(ctrl.model.results), 6)
+            ok.enabled = False
+            self.assertEqual(runs(), [(refused.url, 4)])
+            ctrl.cleanup()
+
+    def test_virtual_users(self):
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW, "body")
+        with StandInServer() as server:
+            endpoints = [model.Endpoint(server.url(f"/{i}"), model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)),
+                                        fuzz_test=model.FuzzTest(3)) for i in range(2)]
+            ctrl = controller.Controller(model.Model(endpoints, [], model.DynamicTestingOptions(False, model.PartialDictionary(), 3),
+                                                     model.RunOptions(seed=5)))
+            ctrl.run_testing()
+            ctrl.cleanup()
+
+        results = ctrl.model.results
+        self.assertEqual(len(results), 3 * 8)
+        for user in range(3):
+            own = [r for r in results if r.user == user]
+            self.assertEqual(len(own), 8)
+            # each user went through the endpoints in order
+            self.assertEqual([r.endpoint.url for r in own], [e.url for e in endpoints for i in range(4)])
+        fuzzed = [r.diff_request.body for r in results if r.test_type == model.TestType.FUZZ]
+        self.assertEqual(len(set(fuzzed)), len(fuzzed))  # users don't send the same payloads
+
+    def test_cancel_virtual_users(self):
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW, "body")
+        with StandInServer(latency=0.05) as server:
+            endpoint = model.Endpoint(server.url(), model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)), fuzz_test=model.FuzzTest(20))
+            ctrl = controller.Controller(model.Model([endpoint], [], model.DynamicTestingOptions(False, model.PartialDictionary(), 2)))
+            ctrl.start_testing()
+            while len(ctrl.model.results) < 2:
+                time.sleep(0.01)
+
+            started = time.monotonic()
+            ctrl.cancel_testing()
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertLess(len(ctrl.model.results), 10)  # users stopped after the requests in flight
+            ctrl.cleanup()
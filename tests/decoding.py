@@ -0,0 +1,50 @@
+import unittest
+
+from web_tester import decoding
+from web_tester.controller import response_errors
+from web_tester.signatures import SignatureMatcher
+from web_tester.streaming import BodyReader
+
+
+class TestDecoding(unittest.TestCase):
+    def test_declared_charset(self):
+        self.assertEqual(decoding.declared_charset("text/html; charset=UTF-8"), "utf-8")
+        self.assertEqual(decoding.declared_charset("text/html; Charset=\"windows-1251\""), "cp1251")
+        self.assertIsNone(decoding.declared_charset("text/html"))
+        self.assertIsNone(decoding.declared_charset("text/html; charset=no-such-charset"))
+        self.assertIsNone(decoding.declared_charset(None))
+
+    def test_decode(self):
+        before = decoding.stats()
+        self.assertEqual(decoding.decode("привет".encode("cp1251"), "text/html; charset=windows-1251"), "привет")
+        self.assertEqual(decoding.decode("héllo".encode("utf-8"), "text/html"), "héllo")
+        self.assertEqual(decoding.decode("héllo".encode("latin-1"), "application/octet-stream"), "héllo")
+        self.assertEqual(decoding.decode(b"", None), "")
+
+        stats = decoding.stats() - before
+        self.assertEqual((stats.declared, stats.utf8, stats.fallback), (1, 2, 1))
+
+    def test_raw_bytes_scan(self):
+        matcher = SignatureMatcher(["Fatal error", "SQL syntax"])
+        body = "<p>ошибка: Fatal error in SQL syntax</p>"
+        self.assertEqual([m.signature for m in matcher.find_all(body.encode("utf-8"))], ["Fatal error", "SQL syntax"])
+        self.assertTrue(decoding.ascii_compatible("cp1251"))
+        self.assertFalse(decoding.ascii_compatible("utf-16"))
+
+        for charset in ["utf-8", "utf-16"]:
+            reader = BodyReader(1000, charset, matcher)
+            data = body.encode(charset)
+            for i in range(0, len(data), 7):
+                reader.feed(data[i:i + 7])
+            self.assertEqual(reader.finish()[1].error.signature, "Fatal error", charset)
+
+    def test_response_errors(self):
+        class Response:
+            def __init__(self, content: bytes, content_type: str):
+                self.content = content
+                self.headers = {"Content-Type": content_type}
+
+        body = "Fatal error"
+        self.assertIsNotNone(response_errors(Response(body.encode("utf-8"), "text/html"), body))
+        self.assertIsNotNone(response_errors(Response(body.encode("utf-16"), "text/html; charset=utf-16"), body))
+        self.assertIsNone(response_errors(Response(b"fine", "text/html"), "fine"))
@@ -0,0 +1,25 @@
+import unittest
+
+from web_tester import logs
+from benchmarks.import_time import measure
+
+
+class TestLogs(unittest.TestCase):
+    def test_memory_sink(self):
+        sink = logs.MemorySink(2)
+        logs.add_sink(sink)
+        try:
+            logs.log(logs.LogLevel.info, "first")
+            logs.log(logs.LogLevel.error, "second")
+            logs.log(logs.LogLevel.debug, "third")
+            logs.event("run_finished", {"results": 1})
+        finally:
+            logs.remove_sink(sink)
+        logs.log(logs.LogLevel.info, "after removal")
+
+        self.assertEqual(list(map(lambda m: m[2], sink.messages)), ["second", "third"])
+        self.assertEqual(list(map(lambda e: e[1], sink.events)), ["run_finished"])
+
+    def test_core_without_gui(self):
+        _, gui_loaded = measure("web_tester.controller")
+        self.assertFalse(gui_loaded)
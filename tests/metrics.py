@@ -0,0 +1,50 @@
+import unittest
+import random
+import datetime
+
+from web_tester import model
+from web_tester.metrics import LatencyHistogram, RunMetrics
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_accuracy(self):
+        rand = random.Random(1)
+        values = [rand.lognormvariate(-3, 1) for i in range(10000)]
+        histogram = LatencyHistogram(0.02)
+        for value in values:
+            histogram.record(value)
+
+        values.sort()
+        for q in [50, 90, 99]:
+            expected = values[int(q / 100 * len(values)) - 1]
+            self.assertAlmostEqual(histogram.percentile(q), expected, delta=expected * 0.03)
+        self.assertEqual(histogram.max, values[-1])
+        self.assertLess(len(histogram.buckets), 1000)
+
+    def test_merge(self):
+        a = LatencyHistogram()
+        b = LatencyHistogram()
+        for i in range(1, 101):
+            (a if i % 2 == 0 else b).record(i / 1000)
+
+        a.merge(b)
+        self.assertEqual(a.count, 100)
+        self.assertEqual(a.min, 0.001)
+        self.assertEqual(a.max, 0.1)
+        self.assertAlmostEqual(a.percentile(50), 0.05, delta=0.001)
+
+    def test_run_metrics_from_results(self):
+        endpoint = model.Endpoint.default()
+        results = [model.TestResult(endpoint, model.Severity.OK, "ok", datetime.timedelta(milliseconds=10), test_type=model.TestType.FUZZ),
+                   model.TestResult(endpoint, model.Severity.OK, "ok", datetime.timedelta(milliseconds=30), test_type=model.TestType.FUZZ),
+                   model.TestResult(endpoint, model.Severity.WARNING, "error", None, test_type=model.TestType.FUZZ),
+                   model.TestResult(endpoint, model.Severity.OK, "ok", datetime.timedelta(milliseconds=20), test_type=model.TestType.MATCH)]
+
+        stats = RunMetrics.from_results(results).stats()
+        self.assertEqual(len(stats), 3)  # fuzz, match and total
+        self.assertEqual(stats[-1].name, "Total")
+        self.assertEqual(stats[-1].count, 3)
+        self.assertEqual(stats[-1].errors, 1)
+        self.assertIsNone(stats[-1].throughput)
+        self.assertTrue(stats[0].name.endswith("Fuzz"))
+        self.assertEqual(stats[0].max, 0.03)
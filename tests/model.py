@@ -1,5 +1,10 @@
 import unittest
-from web_tester import model
+from copy import deepcopy
+from http import HTTPStatus
+
+import _pickle as pickle
+
+from web_tester import model, serialization
 
 
 class TestPartialDict(unittest.TestCase):
@@ -37,3 +42,65 @@ class TestPartialDict(unittest.TestCase):
         }
 
         self.assertEqual(pd.get(), model.PartialDictionary.from_dict(dictionary).get())
+
+
+class TestResultLog(unittest.TestCase):
+    def make_result(self, endpoint: model.Endpoint, body: str) -> model.TestResult:
+        response = model.HTTPResponse(HTTPStatus.INTERNAL_SERVER_ERROR, model.ResponseBodyType.HTML, ''.join(["<h1>", body, "</h1>"]),
+                                      model.PartialDictionary.from_dict({"Server": "stand-in"}))
+        request = deepcopy(endpoint.interaction.request)
+        request.body = "fuzzed"
+        return model.TestResult(endpoint, model.Severity.CRITICAL, "Found errors in response", None, request, response)
+
+    def test_shared_content(self):
+        endpoint = model.Endpoint("http://127.0.0.1/", model.Interaction(model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW),
+                                                                        model.HTTPResponse(HTTPStatus.OK)))
+        results = model.ResultLog()
+        for i in range(10):
+            results.append(self.make_result(endpoint, "Fatal error" if i % 2 == 0 else "Other error"))
+
+        self.assertEqual(len({id(r.response.body) for r in results}), 2)
+        self.assertEqual(len({id(r.response.headers) for r in results}), 1)
+        self.assertEqual(len({id(r.diff_request.headers) for r in results}), 1)
+        self.assertFalse(hasattr(results[0], "__dict__"))
+
+        loaded = pickle.loads(pickle.dumps(results, -1))
+        self.assertEqual([r.response.body for r in loaded], [r.response.body for r in results])
+        self.assertEqual(len({id(r.response.body) for r in loaded}), 2)
+
+    def test_load_without_slots(self):
+        # results pickled by versions where they had a __dict__
+        result = model.TestResult.__new__(model.TestResult)
+        result.__setstate__({"endpoint": None, "severity": model.Severity.OK, "verdict": "ok", "elapsed_time": None,
+                             "response": None, "error": None, "diff_request": None, "removed": 1})
+        self.assertEqual(result.verdict, "ok")
+        self.assertFalse(hasattr(result, "test_type"))
+
+    def test_indexed_select(self):
+        endpoints = [model.Endpoint(f"http://127.0.0.1/{i}", model.Interaction(model.HTTPRequest(list(model.HTTPType)[i % 4]),
+                                                                              model.HTTPResponse(HTTPStatus.OK))) for i in range(6)]
+        results = model.ResultLog()
+        items = []
+        filters = [model.TestResultFilter(None, None, 2), model.TestResultFilter("/1", None, 0),
+                   model.TestResultFilter(None, model.HTTPType.GET, 1), model.TestResultFilter("/", model.HTTPType.PUT, 3)]
+        for i in range(200):
+            items.append(model.TestResult(endpoints[i * 7 % 6], list(model.Severity)[i % 4], "verdict", None))
+            results.append(items[-1])
+            if i % 50 == 49:  # appended ones join a view without filtering everything again
+                for filter in filters:
+                    selected, end = results.select(filter, i - 49)
+                    self.assertEqual(selected, [r for r in items[i - 49:] if filter.use(r)])
+                    self.assertEqual(end, i + 1)
+
+        for filter in filters:
+            self.assertEqual(results.select(filter)[0], [r for r in items if filter.use(r)])
+        endpoints[1].url = "http://127.0.0.1/edited"  # endpoints are matched when filtering, not when indexed
+        self.assertEqual(results.select(filters[1])[0], [r for r in items if filters[1].use(r)])
+
+
+class TestDynamicTestingOptions(unittest.TestCase):
+    def test_virtual_users_bounded(self):
+        self.assertEqual(list(map(model.clamp_virtual_users, [-3, 0, 1, 12, 100_000])), [1, 1, 1, 12, model.MAX_VIRTUAL_USERS])
+        options = model.DynamicTestingOptions(False, model.PartialDictionary(), 100_000)
+        data = serialization.dynamic_options_to_json(options)
+        self.assertEqual(serialization.dynamic_options_from_json(data).virtual_users, model.MAX_VIRTUAL_USERS)
@@ -0,0 +1,95 @@
+import unittest
+import json
+import random
+from http import HTTPStatus
+
+from web_tester import model
+from web_tester.payloads import PayloadGenerator, apply_payload, make_payload, payload_source, fuzz_json, compile_json, request_seed
+
+
+def make_endpoint(request: model.HTTPRequest) -> model.Endpoint:
+    return model.Endpoint("http://localhost/", model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)),
+                          fuzz_test=model.FuzzTest(100))
+
+
+class TestPayloadGenerator(unittest.TestCase):
+    def generate(self, processes: int):
+        form = make_endpoint(model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.FORM_DATA,
+                                               model.PartialDictionary.from_dict({"a": "b", "c": "d"})))
+        raw = make_endpoint(model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW, "body"))
+        other = make_endpoint(model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW, "body"))
+
+        generator = PayloadGenerator(processes, batch_size=16, max_batches=2, seed=7)
+        generator.add(form, 100, 0)
+        generator.add(raw, 50, 1)
+        generator.start()
+
+        form_payloads = [generator.get(form) for i in range(100)]
+        raw_payloads = [generator.get(raw) for i in range(50)]
+        seed, payload = generator.get(form)  # all were used, caller generates from the next seed
+        self.assertIsNone(payload)
+        self.assertNotIn(seed, map(lambda p: p[0], form_payloads))
+        self.assertIsNone(generator.get(other))
+        generator.close()
+
+        self.assertTrue(all(map(lambda p: isinstance(p[1], list) and len(p[1]) == 2, form_payloads)))
+        self.assertTrue(all(map(lambda p: isinstance(p[1], str), raw_payloads)))
+        self.assertGreater(len(set(raw_payloads)), 40)
+        self.assertEqual(generator.generated, 150)
+        return form_payloads + raw_payloads
+
+    def test_thread(self):
+        self.generate(0)
+
+    def test_processes(self):
+        self.generate(2)
+
+    def test_seeded(self):
+        # same payloads for the same seeds however they're generated, and from the seed alone
+        payloads = self.generate(0)
+        self.assertEqual(sorted(payloads), sorted(self.generate(2)))
+        self.assertEqual(payloads[0][1], make_payload(model.RequestBodyType.FORM_DATA, 2, payloads[0][0]))
+        self.assertEqual(payloads[0][0], request_seed(7, 0, model.TestType.FUZZ, 0))
+        self.assertNotEqual(make_payload(model.RequestBodyType.RAW, None, 1), make_payload(model.RequestBodyType.RAW, None, 2))
+
+    def test_get_without_blocking(self):
+        raw = make_endpoint(model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.RAW, "body"))
+        generator = PayloadGenerator(0, seed=7)
+        generator.add(raw, 10)  # not started, nothing gets generated
+        seeds = [generator.get(raw, block=False) for i in range(2)]
+        self.assertEqual([payload for seed, payload in seeds], [None, None])
+        self.assertEqual([seed for seed, payload in seeds], [request_seed(7, 0, model.TestType.FUZZ, i) for i in range(2)])
+        generator.close()
+
+    def test_apply_payload(self):
+        request = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.FORM_DATA,
+                                    model.PartialDictionary.from_dict({"a": "b", "c": "d"}))
+        request.body.elements[0].enabled = False
+        payload = make_payload(request.body_type, payload_source(request))
+        self.assertEqual(len(payload), 1)
+
+        apply_payload(request, payload)
+        self.assertEqual(request.body.elements[0].value, "b")
+        self.assertEqual(request.body.elements[1].value, payload[0])
+
+
+class TestJsonTemplate(unittest.TestCase):
+    body = {"name": "a", "id": 1, "price": 2.5, "admin": True, "none": None,
+            "items": [{"id": 2, "tags": ["b", "c"]}, 3], "nested": {"key \"quoted\"": "d"}}
+
+    def test_matches_fuzz_json(self):
+        template = compile_json(json.dumps(self.body))
+        for seed in range(5):
+            random.seed(seed)
+            expected = json.dumps(fuzz_json(self.body, lambda: "ü\n"))
+            random.seed(seed)
+            self.assertEqual(template.render(lambda: "ü\n"), expected)
+
+    def test_arrays_and_types(self):
+        fuzzed = json.loads(compile_json(json.dumps(self.body)).render(lambda: "fuzzed"))
+        self.assertEqual(fuzzed["items"][0]["tags"], ["fuzzed", "fuzzed"])
+        self.assertIsInstance(fuzzed["items"][1], int)
+        self.assertIsInstance(fuzzed["admin"], bool)
+        self.assertIsInstance(fuzzed["price"], float)
+        self.assertIsNone(fuzzed["none"])
+        self.assertEqual(fuzzed["nested"], {"key \"quoted\"": "fuzzed"})
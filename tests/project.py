@@ -0,0 +1,138 @@
+import unittest
+import datetime
+import sqlite3
+import tempfile
+import os
+from copy import deepcopy
+from http import HTTPStatus
+
+import _pickle as pickle
+
+from web_tester import controller, model
+from web_tester.project import save_project, load_project, load_results, ProjectError
+from web_tester.serialization import endpoint_to_json, run_options_to_json
+
+
+class TestProject(unittest.TestCase):
+    def make_model(self) -> model.Model:
+        element = model.PartialDictionary.Element
+        form = model.HTTPRequest(model.HTTPType.POST, model.RequestBodyType.FORM_DATA, model.PartialDictionary([element("a", "b", True), element("c", "d", False)]),
+                                 model.PartialDictionary.from_dict({"X-Test": "1"}))
+        json_request = model.HTTPRequest(model.HTTPType.PUT, model.RequestBodyType.JSON, '{"a": [1, 2]}')
+        endpoints = [
+            model.Endpoint("http://127.0.0.1/form", model.Interaction(form, model.HTTPResponse(HTTPStatus.CREATED, model.ResponseBodyType.HTML, "<p>ok</p>")),
+                           sqlinj_test=model.SQLInjectionTest(5), rate_limit=model.RateLimit(5, 2, 1), max_body_size=1000),
+            model.Endpoint("http://127.0.0.1/json", model.Interaction(json_request, model.HTTPResponse(HTTPStatus.OK)), fuzz_test=None, enabled=False),
+        ]
+        ret = model.Model(endpoints, [], model.DynamicTestingOptions(True, model.PartialDictionary.from_dict({"session": "1"})),
+                          model.RunOptions(model.Engine.ASYNCIO, 50, model.RateLimit(100), True, 2))
+
+        for i in range(20):
+            endpoint = endpoints[i % 2]
+            request = endpoint.interaction.request
+            if i % 3 == 0:
+                request = deepcopy(request)
+                request.cookies = model.PartialDictionary.from_dict({"fuzzed": str(i)})
+            response = model.HTTPResponse(HTTPStatus.OK, model.ResponseBodyType.JSON, '{"ok": true}', model.PartialDictionary.from_dict({"Server": "x"}))
+            ret.results.append(model.TestResult(endpoint, model.Severity(i % 4), f"verdict {i}", datetime.timedelta(milliseconds=i),
+                                                request, response if i % 5 != 0 else None, None if i % 5 != 0 else ConnectionError("refused"),
+                                                model.TestType.FUZZ, i * 1000, i % 3 + 1, "fingerprint"))
+        return ret
+
+    def test_round_trip(self):
+        project = self.make_model()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "project.wt")
+            save_project(project, filename)
+            loaded = load_project(filename)
+
+            self.assertEqual(list(map(endpoint_to_json, loaded.endpoints)), list(map(endpoint_to_json, project.endpoints)))
+            self.assertEqual(run_options_to_json(loaded.run_options), run_options_to_json(project.run_options))
+            self.assertEqual(loaded.dynamic_options.initial_cookies.get(), {"session": "1"})
+            self.assertEqual(len(loaded.results), 0)  # results are read separately
+
+            results = list(load_results(loaded))
+            self.assertEqual(len(loaded.results), 20)
+            for a, b in zip(results, project.results):
+                self.assertEqual((a.severity, a.verdict, a.elapsed_time, a.test_type, a.seed, a.run, a.fingerprint),
+                                 (b.severity, b.verdict, b.elapsed_time, b.test_type, b.seed, b.run, b.fingerprint))
+                self.assertIs(a.endpoint, loaded.endpoints[project.endpoints.index(b.endpoint)])
+                self.assertEqual(a.diff_request.cookies.get(), b.diff_request.cookies.get())
+                self.assertEqual(a.diff_request is a.endpoint.interaction.request, b.diff_request is b.endpoint.interaction.request)
+                self.assertEqual(None if a.response is None else a.response.body, None if b.response is None else b.response.body)
+                self.assertEqual(a.error, None if b.error is None else str(b.error))
+            loaded.results.database.close()
+
+    def test_legacy_pickle(self):
+        project = self.make_model()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "project.wt")
+            with open(filename, "wb") as file:
+                pickle.dump(project, file, -1)
+
+            loaded = load_project(filename)
+            self.assertEqual(len(loaded.results), 20)
+            self.assertEqual(list(map(endpoint_to_json, loaded.endpoints)), list(map(endpoint_to_json, project.endpoints)))
+
+    def test_newer_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "project.wt")
+            save_project(model.Model([], []), filename)
+            with sqlite3.connect(filename) as connection:
+                connection.execute("UPDATE meta SET value = '99' WHERE key = 'version'")
+            connection.close()
+            with self.assertRaises(ProjectError):
+                load_project(filename)
+
+    def test_controller_open_and_save(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "project.wt")
+            save_project(self.make_model(), filename)
+
+            ctrl = controller.Controller(model.Model([], []))
+            ctrl.open(filename)
+            ctrl.set_result_filter(model.TestResultFilter(None, None, model.Severity.CRITICAL.value))
+            ctrl.wait_loading()
+            self.assertEqual(len(ctrl.test_results()), 5)
+            self.assertEqual(ctrl.metrics.stats()[-1].count + ctrl.metrics.stats()[-1].errors, 20)
+
+            ctrl.save(filename)  # over the file results were loaded from
+            ctrl.open(filename)
+            ctrl.wait_loading()
+            self.assertEqual(len(ctrl.model.results), 20)
+
+            ctrl.open(filename)
+            ctrl.start_save(filename).join()  # still loading, saved from another thread once it's done
+            self.assertFalse(ctrl.saving())
+            ctrl.open(filename)
+            ctrl.wait_loading()
+            self.assertEqual(len(ctrl.model.results), 20)
+            ctrl.cleanup()
+
+    def test_open_does_not_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "other.db")
+            with sqlite3.connect(filename) as connection:
+                connection.execute("CREATE TABLE other (a INTEGER)")
+            connection.close()
+            with open(filename, "rb") as file:
+                before = file.read()
+            with self.assertRaises(ProjectError):
+                load_project(filename)
+            with open(filename, "rb") as file:
+                self.assertEqual(file.read(), before)
+
+            with sqlite3.connect(filename) as connection:  # format without version
+                connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                connection.execute("INSERT INTO meta VALUES ('format', 'web-tester')")
+            connection.close()
+            with self.assertRaises(ProjectError):
+                load_project(filename)
+
+            project = os.path.join(directory, "project.wt")
+            save_project(self.make_model(), project)
+            os.chmod(project, 0o444)
+            loaded = load_project(project)
+            self.assertEqual(len(list(load_results(loaded))), 20)
+            loaded.results.database.close()
+            self.assertEqual(sorted(os.listdir(directory)), ["other.db", "project.wt"])  # no wal files
@@ -0,0 +1,83 @@
+import unittest
+import datetime
+import tempfile
+import os
+from copy import deepcopy
+from http import HTTPStatus
+
+from web_tester import controller, model
+from web_tester.result_store import ResultStore, open_results
+from benchmarks.server import StandInServer
+
+
+class TestResultStore(unittest.TestCase):
+    def make_results(self) -> (list[model.Endpoint], list[model.TestResult]):
+        endpoints = [model.Endpoint(f"http://127.0.0.1/{name}", model.Interaction(model.HTTPRequest(http_type), model.HTTPResponse(HTTPStatus.OK)))
+                     for name, http_type in [("users", model.HTTPType.GET), ("users", model.HTTPType.POST), ("items", model.HTTPType.GET)]]
+        results = []
+        for i in range(30):
+            endpoint = endpoints[i % 3]
+            request = deepcopy(endpoint.interaction.request) if i % 2 == 0 else endpoint.interaction.request
+            response = model.HTTPResponse(HTTPStatus.OK, model.ResponseBodyType.HTML, f"<p>{i % 4}</p>")
+            results.append(model.TestResult(endpoint, list(model.Severity)[i % 4], f"verdict {i}", datetime.timedelta(milliseconds=i),
+                                            request, response, test_type=model.TestType.FUZZ))
+        return endpoints, results
+
+    def test_written_through(self):
+        endpoints, results = self.make_results()
+        with tempfile.TemporaryDirectory() as directory:
+            log = model.ResultLog(database=ResultStore(os.path.join(directory, "results.db")))
+            for result in results:
+                log.append(result)
+
+            def expected(filter, start=0):
+                return [r.verdict for r in results[start:] if filter.use(r)]
+
+            filters = [model.TestResultFilter(None, None, 2), model.TestResultFilter("users", model.HTTPType.POST, 0),
+                       model.TestResultFilter("", None, 0), model.TestResultFilter("nothing", None, 0)]
+            for filter in filters:
+                for start in [0, 7, 30]:
+                    selected, end = log.select(filter, start)
+                    self.assertEqual([r.verdict for r in selected], expected(filter, start))
+                    self.assertEqual(end, 30)
+
+            database = log.database
+            self.assertEqual([r.verdict for r in database.results()], [r.verdict for r in results])
+            self.assertEqual(database.connection.execute("SELECT count(*) FROM bodies").fetchone()[0], 4)
+            database.close()
+
+    def test_reopen(self):
+        # nothing is closed, like after a crash
+        endpoints, results = self.make_results()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.db")
+            database = ResultStore(filename)
+            for result in results:
+                database.append(result)
+
+            loaded = open_results(filename, endpoints[1:])
+            self.assertEqual([r.verdict for r in loaded], [r.verdict for r in results])
+            self.assertEqual([r.response.body for r in loaded], [r.response.body for r in results])
+            self.assertEqual([r.elapsed_time for r in loaded], [r.elapsed_time for r in results])
+            self.assertIs(loaded[1].endpoint, endpoints[1])
+            self.assertIs(loaded[1].diff_request, endpoints[1].interaction.request)
+            self.assertIsNot(loaded[0].endpoint, endpoints[0])  # not in the project anymore, unpickled copy
+            self.assertEqual(loaded[0].endpoint.url, endpoints[0].url)
+
+            loaded.database.close()
+            database.close()
+
+    def test_controller_run(self):
+        with StandInServer(error_rate=0.5) as server, tempfile.TemporaryDirectory() as directory:
+            request = model.HTTPRequest(model.HTTPType.GET)
+            endpoint = model.Endpoint(server.url(), model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)), fuzz_test=model.FuzzTest(20))
+            filename = os.path.join(directory, "results.db")
+            ctrl = controller.Controller(model.Model([endpoint], [], run_options=model.RunOptions(result_database=filename)))
+            ctrl.set_result_filter(model.TestResultFilter(None, None, model.Severity.CRITICAL.value))
+            ctrl.start_testing().result()
+
+            critical = [r for r in ctrl.model.results if r.severity == model.Severity.CRITICAL]
+            self.assertGreater(len(critical), 0)
+            self.assertEqual(ctrl.test_results(), critical)
+            self.assertEqual(len(list(ctrl.model.results.database.results())), len(ctrl.model.results))
+            ctrl.cleanup()
@@ -0,0 +1,107 @@
+import unittest
+import time
+import threading
+from http import HTTPStatus
+from concurrent import futures
+
+from web_tester import model
+from web_tester.scheduler import Scheduler, HostLimiter, AdaptiveLimit, host_limits
+from web_tester.sessions import host_key
+
+
+class TestScheduler(unittest.TestCase):
+    def test_throttled_host_does_not_block_others(self):
+        limits = {host_key("http://slow/"): model.RateLimit(20, 1)}
+        with futures.ThreadPoolExecutor(8) as executor:
+            scheduler = Scheduler(executor, limits)
+            start = time.monotonic()
+            for i in range(6):
+                scheduler.add("http://slow/", lambda: "slow")
+            for i in range(50):
+                scheduler.add("http://fast/", lambda: "fast")
+
+            finished = {"slow": [], "fast": []}
+            for future in scheduler.run():
+                finished[future.result()].append(time.monotonic() - start)
+
+        self.assertGreaterEqual(max(finished["slow"]), 5 / 20 - 0.01)
+        self.assertLess(max(finished["fast"]), min(0.1, max(finished["slow"])))
+
+    def test_max_in_flight(self):
+        limits = {host_key("http://host/"): model.RateLimit(0, 1, 2)}
+        in_flight = [0, 0]  # current, max
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[0], in_flight[1])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+        with futures.ThreadPoolExecutor(8) as executor:
+            scheduler = Scheduler(executor, limits)
+            for i in range(10):
+                scheduler.add("http://host/", job)
+            self.assertEqual(len(list(scheduler.run())), 10)
+        self.assertEqual(in_flight[1], 2)
+
+    def test_max_in_flight_without_scheduler(self):
+        limiter = HostLimiter(model.RateLimit(0, 1, 2))
+        in_flight = [0, 0]  # current, max
+        lock = threading.Lock()
+
+        def job():
+            limiter.start()
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[0], in_flight[1])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            limiter.finish()
+
+        with futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda i: job(), range(10)))
+        self.assertEqual(in_flight[1], 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_strictest_limit_per_host(self):
+        request = model.Interaction(model.HTTPRequest(model.HTTPType.GET), model.HTTPResponse(HTTPStatus.OK))
+        endpoints = [model.Endpoint("http://host/a", request, rate_limit=model.RateLimit(5, 2, 0)),
+                     model.Endpoint("http://host/b", request, rate_limit=model.RateLimit(10, 1, 3)),
+                     model.Endpoint("http://other/", request)]
+        limits = host_limits(endpoints)
+
+        limit = limits[host_key("http://host/")]
+        self.assertEqual((limit.requests_per_second, limit.burst, limit.max_in_flight), (5, 1, 3))
+        self.assertNotIn(host_key("http://other/"), limits)
+
+
+class TestAdaptiveLimit(unittest.TestCase):
+    def test_grows_while_latency_is_flat(self):
+        limit = AdaptiveLimit(maximum=16, initial=2)
+        for i in range(200):
+            limit.on_result(0.05, False)
+        self.assertEqual(limit.current(), 16)
+
+    def test_backs_off_once_per_window(self):
+        limit = AdaptiveLimit(maximum=16, initial=16)
+        for i in range(5):
+            limit.on_result(None, True)
+        self.assertEqual(limit.current(), 8)
+
+        for i in range(20):
+            limit.on_result(None, True)
+        self.assertEqual(limit.current(), 2)
+
+    def test_backs_off_on_latency_spike(self):
+        limit = AdaptiveLimit(maximum=16, initial=8)
+        for i in range(20):
+            limit.on_result(0.01, False)
+        before = limit.current()
+        for i in range(20):
+            limit.on_result(1, False)
+        self.assertLess(limit.current(), before)
+        self.assertEqual(len(limit.timeline(10)), 10)
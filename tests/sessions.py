@@ -0,0 +1,63 @@
+import unittest
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from web_tester import sessions
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = (self.headers.get("Cookie") or "").encode()
+        self.send_response(200)
+        self.send_header("Set-Cookie", "leak=1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_host_key(self):
+        self.assertEqual(sessions.host_key("https://Example.com/a"), ("https", "example.com", 443))
+        self.assertEqual(sessions.host_key("http://example.com:8080/b"), ("http", "example.com", 8080))
+
+    def test_reuse_without_cookie_leak(self):
+        pool = sessions.SessionPool(2)
+        for i in range(5):
+            response = pool.get(self.url).get(self.url, cookies={"sent": "yes"})
+            self.assertEqual(response.text, "sent=yes")
+
+        stats = pool.stats()
+        self.assertEqual(stats.requests, 5)
+        self.assertEqual(stats.connections, 1)
+        pool.close()
+
+    def test_grow_keeps_connections(self):
+        pool = sessions.SessionPool(1)
+        pool.get(self.url).get(self.url)
+        pool.grow(4)
+        pool.grow(2)  # never shrinks
+        self.assertEqual(pool.pool_size, 4)
+
+        responses = [pool.get(self.url).get(self.url, stream=True) for i in range(4)]  # all held open at once
+        for response in responses:
+            response.close()
+        pool.get(self.url).get(self.url)
+
+        stats = pool.stats()
+        self.assertEqual(stats.requests, 6)  # counted from before growing
+        self.assertEqual(stats.connections, 4)  # first one kept alive, all four went back to the pool
+        pool.close()
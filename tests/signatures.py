@@ -0,0 +1,40 @@
+import unittest
+import re
+
+from web_tester.signatures import SignatureMatcher
+
+
+class TestSignatureMatcher(unittest.TestCase):
+    signatures = ["error", "Died at", "Died on line", "ORA-0", "SQL Server Driver][SQL Server", "Warning: mysql_query()"]
+
+    def test_word_boundaries(self):
+        matcher = SignatureMatcher(self.signatures)
+        self.assertFalse(matcher.matches("no errors here"))
+        self.assertFalse(matcher.matches("ORA-01"))
+        self.assertTrue(matcher.matches("ORA-0 failed"))
+        self.assertTrue(matcher.matches("Died on line 64"))
+
+    def test_reports_match(self):
+        match = SignatureMatcher(self.signatures).search("Script Died at line 3")
+        self.assertEqual((match.signature, match.start, match.end), ("Died at", 7, 14))
+
+    def test_same_as_alternation(self):
+        matcher = SignatureMatcher(self.signatures)
+        legacy = re.compile(f"\\b({'|'.join(map(re.escape, self.signatures))})\\b")
+
+        texts = ["error", "errors", "an error.", "Died", "Died atx", "Died on line", "xWarning: mysql_query()y",
+                 "[SQL Server Driver][SQL Server]", "ORA-0", "_error_", "Died at Died on"]
+        for text in texts:
+            self.assertEqual(matcher.matches(text), legacy.search(text) is not None, text)
+
+    def test_non_ascii_neighbour(self):
+        matcher = SignatureMatcher(self.signatures)
+        for text in ["ошибкаerror here", "ошибка error here", "é error", "errorошибка", "«error»"]:
+            expected = matcher.search(text)
+            match = matcher.search(text.encode("utf-8"))
+            if expected is None:
+                self.assertIsNone(match, text)
+            else:
+                self.assertEqual((match.signature, match.start, match.end), (expected.signature, expected.start, expected.end), text)
+            self.assertEqual(matcher.matches(text.encode("utf-8")), matcher.matches(text), text)
+        self.assertIsNone(matcher.search("ошибкаerror here".encode("utf-8")))
@@ -0,0 +1,69 @@
+import unittest
+from http import HTTPStatus
+
+from web_tester import model
+from web_tester.controller import Controller, response_convert, response_errors
+from web_tester.signatures import SignatureMatcher
+from web_tester.streaming import StreamScanner, BodyReader
+from benchmarks.server import StandInServer
+
+
+class TestStreaming(unittest.TestCase):
+    def test_scanner_across_chunks(self):
+        matcher = SignatureMatcher(["Fatal error", "ORA-0", "SQL syntax"])
+        texts = ["lorem ipsum Fatal error dolor", "xFatal error ORA-0", "SQL syntaxes ORA-01 and SQL syntax", "nothing here"]
+        for text in texts:
+            expected = matcher.search(text)
+            for size in range(1, len(text) + 1):
+                scanner = StreamScanner(matcher)
+                for i in range(0, len(text), size):
+                    scanner.feed(text[i:i + size])
+                match = scanner.feed("", final=True)
+
+                if expected is None:
+                    self.assertIsNone(match, (text, size))
+                else:
+                    self.assertEqual((match.signature, match.start, match.end), (expected.signature, expected.start, expected.end), (text, size))
+
+    def test_reader_non_ascii(self):
+        matcher = SignatureMatcher(["error", "ORA-0"])
+        for text in ["ascii first, then ошибкаerror and ORA-0 here", "«error» here", "plain error", "ошибкаerror"]:
+            expected = matcher.search(text)
+            body = text.encode("utf-8")
+            for size in range(1, len(body) + 1):
+                reader = BodyReader(len(body), "utf-8", matcher)
+                for i in range(0, len(body), size):
+                    reader.feed(body[i:i + size])
+                content, info = reader.finish()
+
+                self.assertEqual(content, body)
+                if expected is None:
+                    self.assertIsNone(info.error, (text, size))
+                else:
+                    self.assertEqual((info.error.start, info.error.end), (expected.start, expected.end), (text, size))
+
+    def request(self, server, max_body_size: int) -> model.HTTPResponse:
+        request = model.HTTPRequest(model.HTTPType.GET)
+        endpoint = model.Endpoint(server.url(), model.Interaction(request, model.HTTPResponse(HTTPStatus.OK)), max_body_size=max_body_size)
+        controller = Controller(model.Model([endpoint], []))
+        response = controller.make_request(endpoint)
+        controller.cleanup()
+        return response
+
+    def test_body_cap(self):
+        with StandInServer(body_size=100_000, body_type="html") as server:
+            response = response_convert(self.request(server, 1000))
+            self.assertTrue(response.truncated)
+            self.assertEqual(len(response.body), 1000)
+            self.assertGreater(response.length, 99_000)
+            self.assertEqual(response.body_type, model.ResponseBodyType.HTML)
+
+            response = response_convert(self.request(server, 1_000_000))
+            self.assertFalse(response.truncated)
+            self.assertEqual(response.length, len(response.body))
+
+    def test_errors_found_while_streaming(self):
+        with StandInServer(error_rate=1) as server:
+            response = self.request(server, 1_000_000)
+            self.assertIsNotNone(response.body_info.error)
+            self.assertEqual(response_errors(response, ""), response.body_info.error)
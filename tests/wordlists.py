@@ -0,0 +1,114 @@
+import unittest
+import tempfile
+import random
+import os
+
+import _pickle as pickle
+
+from concurrent import futures
+from unittest import mock
+
+from web_tester.wordlists import MappedWordlist, WordlistCache, index_path
+
+
+class TestMappedWordlist(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache.name})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        self.cache.cleanup()
+
+    def write(self, directory: str, data: bytes) -> str:
+        filename = os.path.join(directory, "wordlist.txt")
+        with open(filename, "wb") as file:
+            file.write(data)
+        return filename
+
+    def test_same_lines_as_readlines(self):
+        texts = ["' or 1=1--\n\" or \"\"=\"\n\n  spaced  \n", "no newline at end", "windows\r\nlines\r\n", "ünïcode\nline\n", "\n\n", "",
+                 "a\rb\nc\n", "mac\rlines\r\rend", "split\r"]
+        with tempfile.TemporaryDirectory() as directory:
+            for text in texts:
+                filename = self.write(directory, text.encode("utf-8"))
+                if os.path.exists(index_path(filename)):  # same size and time as the last text is possible
+                    os.remove(index_path(filename))
+                with open(filename, "r", encoding="utf-8", newline="") as file:
+                    expected = list(map(lambda s: s.strip(), file.readlines()))
+
+                wordlist = MappedWordlist(filename)
+                self.assertEqual(list(wordlist), expected, text)
+                if text == "a\rb\nc\n":
+                    self.assertEqual(list(wordlist), ["a", "b", "c"])
+                self.assertEqual(len(wordlist), len(expected))
+                if expected != []:
+                    self.assertEqual(wordlist[-1], expected[-1])
+                    self.assertIn(wordlist.sample(random.Random(1)), expected)
+                wordlist.close()
+
+    def test_cached_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = self.write(directory, b"a\nb\nc\n")
+            wordlist = MappedWordlist(filename)
+            self.assertTrue(os.path.exists(index_path(filename)))
+            self.assertEqual(os.listdir(directory), ["wordlist.txt"])  # nothing written next to the wordlist
+            self.assertIsNone(wordlist.index)  # just built
+            wordlist.close()
+
+            wordlist = MappedWordlist(filename)
+            self.assertIsNotNone(wordlist.index)
+            self.assertEqual(list(wordlist), ["a", "b", "c"])
+            copy = pickle.loads(pickle.dumps(wordlist))
+            self.assertEqual(list(copy), ["a", "b", "c"])
+            copy.close()
+            wordlist.close()
+
+            # changed file gets a new index
+            filename = self.write(directory, b"a\nbb\nccc\ndddd\n")
+            wordlist = MappedWordlist(filename)
+            self.assertEqual(list(wordlist), ["a", "bb", "ccc", "dddd"])
+            wordlist.close()
+
+
+class TestWordlistCache(unittest.TestCase):
+    def test_lru_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = []
+            for name in "abc":
+                filenames.append(os.path.join(directory, name))
+                with open(filenames[-1], "wb") as file:
+                    file.write(b"x" * 99 + b"\n")  # 100 bytes and 16 for offsets
+
+            cache = WordlistCache(250)
+            a = cache.get(filenames[0])
+            cache.get(filenames[1])
+            self.assertIs(cache.get(filenames[0]), a)  # b is now least recently used
+            cache.get(filenames[2])
+            self.assertEqual(list(cache.items), [filenames[0], filenames[2]])
+            self.assertEqual(cache.size, 232)
+
+            stats = cache.stats()
+            self.assertEqual((stats.hits, stats.misses, stats.evictions), (1, 3, 1))
+            self.assertEqual(a[0], "x" * 99)  # evicted wordlists still work for whoever holds them
+
+            cache.resize(100)
+            self.assertEqual(list(cache.items), [filenames[2]])
+
+    def test_concurrent_and_preload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "wordlist.txt")
+            with open(filename, "wb") as file:
+                file.write(b"a\nb\n" * 10000)
+
+            cache = WordlistCache()
+            with futures.ThreadPoolExecutor(8) as pool:
+                wordlists = list(pool.map(lambda i: cache.get(filename), range(8)))
+            self.assertTrue(all(map(lambda w: w is wordlists[0], wordlists)))
+
+            cache.remove(filename)
+            cache.preload([filename, os.path.join(directory, "missing.txt")]).join()
+            before = cache.stats()
+            self.assertEqual(len(cache.get(filename)), 20000)
+            self.assertEqual((cache.stats() - before).hits, 1)
@@ -1,4 +1,9 @@
-from .main import main
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:  # headless mode, gui is never imported
+        from .cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    from .main import main
     main()
@@ -0,0 +1,196 @@
+import asyncio
+import datetime
+import time
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.cookies import cookiejar_from_dict
+from requests.utils import get_encoding_from_headers
+
+from . import model
+from .scheduler import TokenBucket
+from .sessions import host_key
+from .controller import error_matcher
+from .streaming import BodyReader, CHUNK_SIZE, content_length
+from .decoding import declared_charset
+
+
+def convert_error(error: Exception) -> Exception:
+    # map aiohttp errors to the requests ones so results match the thread engine
+    if isinstance(error, aiohttp.ConnectionTimeoutError):
+        return requests.ConnectTimeout(str(error))
+    if isinstance(error, (aiohttp.SocketTimeoutError, asyncio.TimeoutError)):
+        return requests.ReadTimeout(str(error))
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return requests.ConnectionError(str(error))
+    if isinstance(error, aiohttp.ClientResponseError):
+        return requests.HTTPError(str(error))
+    return error
+
+
+def response_from(response: aiohttp.ClientResponse, content: bytes, elapsed: datetime.timedelta) -> requests.Response:
+    ret = requests.Response()
+    ret.status_code = response.status
+    ret.reason = response.reason
+    ret.url = str(response.url)
+    ret.elapsed = elapsed
+    ret._content = content
+
+    # requests joins repeated headers with a comma
+    headers = CaseInsensitiveDict()
+    for k, v in response.headers.items():
+        headers[k] = v if k not in headers else f"{headers[k]}, {v}"
+    ret.headers = headers
+    ret.encoding = get_encoding_from_headers(headers)
+    ret.cookies = cookiejar_from_dict({k: v.value for k, v in response.cookies.items()})
+    return ret
+
+
+class AsyncHostLimiter:
+    def __init__(self, limit: model.RateLimit = None):
+        self.bucket = None
+        self.semaphore = None
+        if limit is not None:
+            if limit.requests_per_second > 0:
+                self.bucket = TokenBucket(limit.requests_per_second, limit.burst)
+            if limit.max_in_flight > 0:
+                self.semaphore = asyncio.Semaphore(limit.max_in_flight)
+
+    async def acquire(self) -> ():
+        if self.semaphore is not None:
+            await self.semaphore.acquire()
+        if self.bucket is not None:
+            while (delay := self.bucket.try_acquire()) > 0:
+                await asyncio.sleep(delay)
+
+    def release(self) -> ():
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+
+class AsyncEngine:
+    def __init__(self, controller, max_in_flight: int = 1000, limits: dict[(str, str, int), model.RateLimit] = {}, concurrency=None):
+        self.controller = controller
+        self.max_in_flight = max(1, max_in_flight)
+        self.limits = limits
+        self.limiters = {}
+        self.concurrency = concurrency  # AdaptiveLimit, caps in flight below max_in_flight
+
+        self.in_flight = 0
+        self.slots = None
+
+        self.loop = None
+        self.task = None
+
+    def prepare_request(self, endpoint: model.Endpoint, request: model.HTTPRequest) -> requests.PreparedRequest:
+        # use the same session defaults as the thread engine so identical bytes are sent
+        session = self.controller.sessions.get(endpoint.url)
+        return session.prepare_request(requests.Request(endpoint.http_type(), endpoint.url, data=request.get_body(),
+                                                        headers=request.headers.get(), cookies=request.cookies.get()))
+
+    async def make_request(self, session: aiohttp.ClientSession, endpoint: model.Endpoint, request: model.HTTPRequest) -> requests.Response:
+        prepared = self.prepare_request(endpoint, request)
+        body = prepared.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=endpoint.max_wait_time, sock_read=endpoint.max_wait_time)
+
+        start = time.perf_counter()
+        async with session.request(prepared.method, prepared.url, data=body, headers=dict(prepared.headers),
+                                   timeout=timeout, allow_redirects=True) as response:
+            elapsed = datetime.timedelta(seconds=time.perf_counter() - start)
+            if endpoint.max_body_size <= 0:
+                return response_from(response, await response.read(), elapsed)
+
+            ret = response_from(response, b"", elapsed)
+            reader = BodyReader(endpoint.max_body_size, declared_charset(ret.headers.get("Content-Type")),
+                                error_matcher(), content_length(ret.headers))
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if reader.feed(chunk):
+                    break
+            ret._content, ret.body_info = reader.finish()
+            return ret
+
+    def limiter(self, url: str) -> AsyncHostLimiter:
+        key = host_key(url)
+        if key not in self.limiters:
+            self.limiters[key] = AsyncHostLimiter(self.limits.get(key))
+        return self.limiters[key]
+
+    def limit(self) -> int:
+        if self.concurrency is None:
+            return self.max_in_flight
+        return min(self.max_in_flight, self.concurrency.current())
+
+    async def acquire_slot(self) -> ():
+        async with self.slots:
+            await self.slots.wait_for(lambda: self.in_flight < self.limit())
+            self.in_flight += 1
+
+    async def release_slot(self) -> ():
+        async with self.slots:
+            self.in_flight -= 1
+            self.slots.notify(max(1, self.limit() - self.in_flight))
+
+    async def run_test(self, session: aiohttp.ClientSession, endpoint: model.Endpoint, test_type: model.TestType) -> model.TestResult:
+        # host limit first so tasks waiting on a throttled host don't take global slots
+        limiter = self.limiter(endpoint.url)
+        await limiter.acquire()
+        try:
+            await self.acquire_slot()
+            try:
+                request, handler, seed = self.controller.prepare_test(endpoint, test_type, block=False)  # never wait in the event loop
+                try:
+                    response = await self.make_request(session, endpoint, request)
+                    result = handler(response)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    result = self.controller.error_result(endpoint, convert_error(error), request)
+                result.test_type = test_type
+                result.seed = seed
+                return result
+            finally:
+                await self.release_slot()
+        finally:
+            limiter.release()
+
+    async def run_tests(self, tests: list[(model.Endpoint, model.TestType)]):
+        self.slots = asyncio.Condition()
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=0)
+
+        async with aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                                         auto_decompress=True) as session:
+            pending = [asyncio.ensure_future(self.run_test(session, endpoint, test_type)) for endpoint, test_type in tests]
+            count = len(pending)
+            try:
+                for future in asyncio.as_completed(pending):
+                    result = await future
+                    self.controller.add_result(result)
+                    self.controller.progress += 1 / count
+            finally:
+                for future in pending:
+                    future.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def run(self, tests: list[(model.Endpoint, model.TestType)]) -> ():
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.task = self.loop.create_task(self.run_tests(tests))
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+            self.loop = None
+            self.task = None
+
+    def cancel(self) -> ():
+        loop = self.loop
+        if loop is not None and self.task is not None:
+            try:
+                loop.call_soon_threadsafe(self.task.cancel)
+            except RuntimeError:  # loop already closed
+                pass
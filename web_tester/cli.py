@@ -0,0 +1,135 @@
+from concurrent import futures
+
+import argparse
+import logging
+import sys
+import time
+
+from . import model
+from . import reports
+from .controller import Controller
+from .project import load_project, load_results
+
+
+def summary(controller: Controller, elapsed: float) -> dict:
+    severities = {s.name: 0 for s in model.Severity}
+    for result in controller.model.results:
+        severities[result.severity.name] += 1
+
+    count = len(controller.model.results)
+    return {
+        "results": count,
+        "seed": controller.seed,
+        "elapsed": elapsed,
+        "requests_per_second": count / elapsed if elapsed > 0 else 0,
+        "severity": severities,
+        "latency": list(map(lambda s: s.to_dict(), controller.metrics.stats())),
+        "decoding": vars(controller.decode_stats) if controller.decode_stats is not None else None,
+        "wordlist_cache": vars(controller.wordlist_stats) if controller.wordlist_stats is not None else None,
+    }
+
+
+def print_progress(controller: Controller, elapsed: float, end: str):
+    count = len(controller.model.results)
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"\r[{round((controller.progress or 0) * 100):3}%] {count} results, {rate:.1f} req/s, {elapsed:.1f}s",
+          end=end, file=sys.stderr, flush=True)
+
+
+def run(args) -> int:
+    try:
+        project = load_project(args.project)
+    except Exception as e:
+        print(f"Failed loading file {args.project}: {str(e)}", file=sys.stderr)
+        return 2
+
+    if args.engine is not None:
+        project.run_options.engine = model.Engine[args.engine.upper()]
+    if args.max_in_flight is not None:
+        project.run_options.max_in_flight = max(1, args.max_in_flight)
+    if args.payload_processes is not None:
+        project.run_options.payload_processes = max(0, args.payload_processes)
+    if args.database is not None:
+        project.run_options.result_database = args.database
+    if args.seed is not None:
+        project.run_options.seed = max(0, args.seed)
+    if args.incremental:
+        project.run_options.incremental = True
+
+    fail_on = model.Severity[args.fail_on.upper()]
+    if args.replay or project.run_options.incremental:
+        for _ in load_results(project):  # results saved with the project are replayed or carried over
+            pass
+
+    controller = Controller(project)
+    end = "" if sys.stderr.isatty() else "\n"
+
+    start = time.perf_counter()
+    if args.replay:
+        future = controller.start_replay(fail_on)
+    else:
+        future = controller.start_testing()
+    cancelled = False
+    try:
+        while not future.done():
+            futures.wait([future], timeout=args.interval)
+            if not future.done():
+                print_progress(controller, time.perf_counter() - start, end)
+    except KeyboardInterrupt:
+        cancelled = True
+        controller.cancel_testing()
+    elapsed = time.perf_counter() - start
+    print_progress(controller, elapsed, "\n")
+
+    if not cancelled and future.exception() is not None:
+        print(f"Testing failed: {str(future.exception())}", file=sys.stderr)
+        controller.cleanup()
+        return 2
+
+    result = summary(controller, elapsed)
+    print(", ".join(f"{k}: {v}" for k, v in result["severity"].items()), file=sys.stderr)
+
+    if args.output is not None:
+        reports.export_json(args.output, controller.model.results, result)
+    if args.save and not cancelled:
+        controller.save(args.project)
+
+    controller.cleanup()
+
+    if cancelled:
+        return 130
+
+    if any(map(lambda tr: tr.severity.value >= fail_on.value, controller.model.results)):
+        return 1
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="web_tester", description="Run saved web tester projects without the GUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run every enabled test of a project file")
+    run_parser.add_argument("project", help="project file saved from the GUI (*.wt)")
+    run_parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    run_parser.add_argument("--fail-on", default="critical", choices=list(map(lambda s: s.name.lower(), model.Severity)),
+                            help="exit with 1 if any result has at least this severity (default: critical)")
+    run_parser.add_argument("--engine", choices=list(map(lambda e: e.name.lower(), model.Engine)),
+                            help="override the engine saved in the project")
+    run_parser.add_argument("--max-in-flight", type=int, help="override max requests in flight for the asyncio engine")
+    run_parser.add_argument("--payload-processes", type=int, help="generate fuzz payloads in this many processes")
+    run_parser.add_argument("--database", help="write results to this SQLite file as they arrive")
+    run_parser.add_argument("--seed", type=int, help="seed fuzz and SQL injection payloads, runs with the same seed send the same requests")
+    run_parser.add_argument("--incremental", action="store_true",
+                            help="only test endpoints that changed or had non-OK results, keep the saved results of the others")
+    run_parser.add_argument("--save", action="store_true", help="save results into the project file after the run")
+    run_parser.add_argument("--replay", action="store_true",
+                            help="only send the requests of saved results with at least --fail-on severity again, as they were")
+    run_parser.add_argument("--interval", type=float, default=1, help="seconds between progress updates")
+    run_parser.add_argument("-v", "--verbose", action="count", default=0, help="log warnings (-v), info (-vv) or debug (-vvv)")
+
+    args = parser.parse_args(argv)
+
+    levels = [logging.CRITICAL, logging.WARNING, logging.INFO, logging.DEBUG]
+    logging.basicConfig(level=levels[min(args.verbose, 3)], format="%(levelname)s %(message)s")
+
+    return run(args)
@@ -1,82 +1,160 @@
 from typing import Callable
 
 from functools import partial
-import string
-import rstr
-import random
 from copy import deepcopy
 
 from concurrent import futures
 
-import re
+import itertools
 import json
+import os
+import random
+import re
+import sys
+import threading
 import requests
 from http import HTTPStatus
 
 from . import model
 from . import reports
+from .sessions import SessionPool, host_key
+from .scheduler import Scheduler, HostLimiter, AdaptiveLimit, host_limits
+from .signatures import SignatureMatcher, SignatureMatch
+from .metrics import RunMetrics, result_key, result_latency
+from .streaming import read_limited
+from .result_store import ResultStore, open_results
+from .project import save_project, load_project, load_results
+from .serialization import endpoint_fingerprint
+from . import decoding
+from .payloads import PayloadGenerator, compile_json, make_payload, payload_source, apply_payload, request_seed
+
+from . import logs
+from .logs import log, LogLevel
+
+
+ERRORS_WORDLIST = "./fuzzdb/regex/errors.txt"
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # what ThreadPoolExecutor picks without max_workers
+FIRST_CHARACTER = re.compile(r"\s*(\S)")
+
+
+def error_matcher() -> SignatureMatcher:
+    return SignatureMatcher.from_file(ERRORS_WORDLIST)
 
-from imgui_bundle import hello_imgui
-log = hello_imgui.log
-LogLevel = hello_imgui.LogLevel
+
+def find_errors(text: str) -> SignatureMatch:
+    return error_matcher().search(text)
+
+
+def response_errors(response: requests.Response, body: str) -> SignatureMatch:
+    if getattr(response, "body_info", None) is not None:  # scanned while reading, body may be cut short
+        return response.body_info.error
+    content = response.content or b""
+    if content.isascii() and decoding.ascii_compatible(decoding.declared_charset(response.headers.get("Content-Type"))):
+        return find_errors(content)  # same text as the decoded body, no need to wait for it
+    return find_errors(body)
 
 
 def match_errors(text: str) -> bool:
-    static = match_errors
-    if not hasattr(static, 'errors'):  # fill with fuzzdb/regex/errors.txt
-        file = open("./fuzzdb/regex/errors.txt", "r")
-        static.errors = '|'.join(map(lambda s: f"({re.escape(s.strip())})", file.readlines()))
-        file.close()
-    ret = re.search(f"\\b({static.errors})\\b", text)
-    # log(LogLevel.debug, str(ret))
-    return ret is not None
+    return error_matcher().matches(text)
+
+
+def classify_body(content_type: str, body: str) -> model.ResponseBodyType:
+    # no parsing: objects and arrays are recognized by first character, anything else needs the server to say it's json.
+    # handlers check it with confirm_body_type before relying on it
+    start = FIRST_CHARACTER.match(body)
+    if start is None:  # empty
+        return model.ResponseBodyType.HTML
+
+    if start.group(1) in ("{", "["):
+        return model.ResponseBodyType.JSON
+    if "json" in content_type.lower():
+        return model.ResponseBodyType.JSON
+    return model.ResponseBodyType.HTML
+
+
+def confirm_body_type(response: model.HTTPResponse) -> model.ResponseBodyType:
+    # classify_body only looks at the first character, a body that looked like json is parsed once its type
+    # gets compared. malformed json and error pages sent as json are html then
+    if response.body_type == model.ResponseBodyType.JSON and not response.truncated:  # a prefix won't parse
+        try:
+            json.loads(response.body)
+        except ValueError:
+            response.body_type = model.ResponseBodyType.HTML
+    return response.body_type
+
+
+def bodies_equal(expected: model.HTTPResponse, received: model.HTTPResponse) -> bool:
+    if expected.body == received.body:
+        return True
+
+    # expected body is prettified while editing, received one is kept as is
+    if expected.body_type == model.ResponseBodyType.JSON and received.body_type == model.ResponseBodyType.JSON and not received.truncated:
+        try:
+            return json.loads(expected.body) == json.loads(received.body)
+        except ValueError:
+            return False
+    return False
 
 
 def response_convert(response: requests.Response) -> model.HTTPResponse:
-    body_type = model.ResponseBodyType.HTML
-    try:  # check if body is json perchance
-        json.loads(response.text)
-        body_type = model.ResponseBodyType.JSON
-    except Exception:
-        pass
+    length, truncated = len(response.content), False
+    if getattr(response, "body_info", None) is not None:
+        length, truncated = response.body_info.length, response.body_info.truncated
+
+    text = decoding.decode(response.content or b"", response.headers.get("Content-Type"))
+    body_type = classify_body(response.headers.get("Content-Type", ""), text)
 
     headers = model.PartialDictionary.from_dict(response.headers)
     cookies = model.PartialDictionary.from_dict(response.cookies)
-    
-    return model.HTTPResponse(HTTPStatus(response.status_code), body_type, response.text, headers, cookies)
-
 
-def fuzz_json(json_body, rand=lambda: rstr.rstr(string.printable)):
-    body = deepcopy(json_body)
+    return model.HTTPResponse(HTTPStatus(response.status_code), body_type, text, headers, cookies, length, truncated)
 
-    if isinstance(body, dict):
-        for k, v in body.items():
-            body[k] = fuzz_json(v, rand)
-        return body
-    if isinstance(body, list):
-        for item in body:
-            item = fuzz_json(item, rand)
-    if isinstance(body, str):
-        return rand()
-    if isinstance(body, int):
-        return round(random.random() * 100) - 50
-    if isinstance(body, float):
-        return random.random() * 100 - 50
-    if isinstance(body, bool):
-        return random.random() >= 0.5
 
-    return body
+def test_count(endpoint: model.Endpoint) -> int:  # requests a run sends to the endpoint
+    ret = 1 if endpoint.match_test else 0
+    if endpoint.fuzz_test is not None:
+        ret += endpoint.fuzz_test.count
+    if endpoint.sqlinj_test is not None:
+        ret += endpoint.sqlinj_test.count
+    return ret
 
 
 class Controller:
-    def __init__(self, model: model.Model = model.Model([], []), thread_pool: futures.ThreadPoolExecutor = futures.ThreadPoolExecutor()):
+    def __init__(self, model: model.Model = model.Model([], []), workers: int = DEFAULT_WORKERS):
         self.model = model
-        self.thread_pool = thread_pool
+        self.workers = workers  # threads running tests, sessions keep as many connections per host
+        self.thread_pool = futures.ThreadPoolExecutor(workers)
+        self.sessions = SessionPool(workers)
+        self.connection_stats = None
+        self.decode_stats = None
+        self.async_engine = None
+        self.scheduler = None
+        self.concurrency = None
+        self.metrics = RunMetrics()
+        self.payloads = None
+
+        self.seed = None  # of the current or last run
+        self.positions = {}  # id(endpoint) -> position in the project, part of request seeds
+        self.request_counts = {}
+        self.seed_lock = threading.Lock()
+
+        self.run = None  # number of the current or last run
+        self.fingerprints = {}  # id(endpoint) -> fingerprint at the start of the run
+        self.carried = set()  # id of endpoints whose results were carried over instead of testing them
 
         self.endpoints_filtered = []
         self.set_endpoint_filter(None)
 
+        self.wordlist_preload = None
+        self.wordlist_stats = None
+
+        self.loader = None  # reads results of an opened project
+        self.loader_stop = False
+        self.saver = None  # saves a project without blocking the gui
+
+        self.results_lock = threading.Lock()
         self.results_filtered = []
+        self.results_seen = 0
         self.set_result_filter(None)
 
         self.in_progress = False
@@ -85,6 +163,14 @@ class Controller:
     def add_endpoint(self, endpoint: model.Endpoint):
         self.model.add_endpoint(endpoint)
         self.filter_endpoints()
+        self.preload_wordlists([endpoint])
+
+    def preload_wordlists(self, endpoints: list[model.Endpoint]) -> threading.Thread:
+        # wordlists are mapped and read in the background so SQL injection tests don't wait for the disk
+        model.Wordlist.cache.resize(self.model.run_options.wordlist_memory * 1024 * 1024)
+        filenames = [e.sqlinj_test.wordlist.filename for e in endpoints if e.sqlinj_test is not None]
+        self.wordlist_preload = model.Wordlist.cache.preload(list(dict.fromkeys(filenames)))
+        return self.wordlist_preload
 
     def remove_endpoint(self, endpoint: model.Endpoint):
         self.model.remove_endpoint(endpoint)
@@ -111,41 +197,105 @@ class Controller:
         self.filter_results()
 
     def filter_results(self):
-        if self.result_filter is None:
-            self.results_filtered = self.model.results
-            return
+        with self.results_lock:
+            self.results_filtered = []
+            self.results_seen = 0
+        self.update_results()
 
-        self.results_filtered = list(filter(
-            partial(model.TestResultFilter.use, self.result_filter),
-            self.model.results))
+    def update_results(self):
+        # only results that arrived since last call get filtered, the endpoint and severity index finds them
+        with self.results_lock:
+            new_results, self.results_seen = self.model.results.select(self.result_filter, self.results_seen)
+            self.results_filtered.extend(new_results)
 
     def test_results(self):
+        self.update_results()
         return self.results_filtered
 
     def open(self, filename: str):
         try:
             log(LogLevel.info, f"Loading file: {filename}")
-            self.model = model.Model.load(filename)
+            self.close_results()
+            self.model = load_project(filename)
+            self.metrics = RunMetrics.from_results(self.model.results)
             self.set_endpoint_filter(None)
             self.set_result_filter(None)
+            self.start_loading()
+            self.preload_wordlists(self.model.enabled_endpoints())
         except Exception as e:
             log(LogLevel.error, f"Failed loading file {str(e)}")
+
+    def start_loading(self):
+        # results show up in the table as they're read, like during a run
+        def load(project: model.Model, metrics: RunMetrics):
+            count = 0
+            try:
+                for result in load_results(project, lambda: self.loader_stop):
+                    metrics.record(result_key(result), result_latency(result))
+                    count += 1
+                log(LogLevel.info, f"Loaded {count} results")
+            except Exception as e:
+                log(LogLevel.error, f"Failed loading results: {str(e)}")
+
+        if self.model.results.database is None:
+            return
+        self.loader_stop = False
+        self.loader = threading.Thread(target=load, args=(self.model, self.metrics), name="result-loader", daemon=True)
+        self.loader.start()
+
+    def wait_loading(self, stop: bool = False):
+        if self.loader is not None:
+            self.loader_stop = stop
+            self.loader.join()
+            self.loader = None
     
+    def open_results(self, filename: str):
+        try:
+            log(LogLevel.info, f"Loading results from database: {filename}")
+            self.close_results()
+            self.model.results = open_results(filename, self.model.endpoints)
+            self.metrics = RunMetrics.from_results(self.model.results)
+            self.filter_results()
+        except Exception as e:
+            log(LogLevel.error, f"Failed loading results: {str(e)}")
+
+    def close_results(self):
+        self.wait_loading(stop=True)
+        if self.model.results.database is not None:
+            self.model.results.database.close()
+            self.model.results.database = None  # results in memory stay
+
     def save(self, filename: str):
         try:
             log(LogLevel.info, f"Saving to file: {filename}")
-            self.model.save(filename)
+            self.wait_loading()  # everything gets saved
+            database = self.model.results.database
+            if database is not None and os.path.abspath(database.filename) == os.path.abspath(filename):
+                self.close_results()  # file gets replaced
+            save_project(self.model, filename)
         except Exception as e:
             log(LogLevel.error, f"Failed saving to file {str(e)}")
 
+    def start_save(self, filename: str) -> threading.Thread:
+        # save waits for results still being read, that takes seconds for big projects
+        self.saver = threading.Thread(target=self.save, args=(filename,), name="project-save", daemon=True)
+        self.saver.start()
+        return self.saver
+
+    def saving(self) -> bool:
+        return self.saver is not None and self.saver.is_alive()
+
     def export(self, filename: str):
-        if self.model.results == []:
+        if len(self.model.results) == 0:
             log(LogLevel.warning, "No results to export")
             return
 
         try:
             log(LogLevel.info, f"Exporting results to file: {filename}")
-            reports.export_test_results(filename, self.model.results)
+            results = self.model.results
+            if results.database is not None:  # read back in batches instead of going through the list
+                results = results.database.results()
+            reports.export_test_results(filename, results, self.metrics)
 
         except Exception as e:
             log(LogLevel.error, f"Failed exporting to file: {str(e)}")
@@ -154,18 +304,13 @@ class Controller:
         if request is None:
             request = endpoint.interaction.request
         
-        if endpoint.http_type() == model.HTTPType.GET:
-            return requests.get(endpoint.url, data=request.get_body(), headers=request.headers.get(),
-                                cookies=request.cookies.get(), timeout=endpoint.max_wait_time)
-        if endpoint.http_type() == model.HTTPType.POST:
-            return requests.post(endpoint.url, data=request.get_body(), headers=request.headers.get(),
-                                 cookies=request.cookies.get(), timeout=endpoint.max_wait_time)
-        if endpoint.http_type() == model.HTTPType.PUT:
-            return requests.put(endpoint.url, data=request.get_body(), headers=request.headers.get(),
-                                cookies=request.cookies.get(), timeout=endpoint.max_wait_time)
-        if endpoint.http_type() == model.HTTPType.DELETE:
-            return requests.delete(endpoint.url, data=request.get_body(), headers=request.headers.get(),
-                                   cookies=request.cookies.get(), timeout=endpoint.max_wait_time)
+        session = self.sessions.get(endpoint.url)
+        stream = endpoint.max_body_size > 0
+        response = session.request(endpoint.http_type(), endpoint.url, data=request.get_body(), headers=request.headers.get(),
+                                   cookies=request.cookies.get(), timeout=endpoint.max_wait_time, stream=stream)
+        if stream:
+            read_limited(response, endpoint.max_body_size, error_matcher())
+        return response
 
     def handle_request(self, endpoint: model.Endpoint, handler: Callable[[requests.Response], model.TestResult], diff_request: model.HTTPRequest = None) -> model.TestResult:
         if diff_request is None:
@@ -176,33 +321,87 @@ class Controller:
             log(LogLevel.info, f"Got response from {endpoint.url} {endpoint.http_type()}")
 
             return handler(response)
-        except requests.ConnectTimeout as error:
+        except Exception as error:
+            return self.error_result(endpoint, error, diff_request)
+
+    def error_result(self, endpoint: model.Endpoint, error: Exception, diff_request: model.HTTPRequest) -> model.TestResult:
+        if isinstance(error, requests.ConnectTimeout):
             log(LogLevel.error, f"Connection timeout for {endpoint.url} {endpoint.http_type()}")
             return model.TestResult(endpoint, model.Severity.CRITICAL, "Connection timeout (exceeded max set for endpoint)",
                                     None, error=error, diff_request=diff_request)
-        except requests.ConnectionError as error:
+        if isinstance(error, requests.ConnectionError):
             log(LogLevel.error, f"Connection error for {endpoint.url} {endpoint.http_type()}")
             return model.TestResult(endpoint, model.Severity.WARNING, "Connection error",
                                     None, error=error, diff_request=diff_request)
-        except requests.HTTPError as error:
+        if isinstance(error, requests.HTTPError):
             log(LogLevel.error, f"HTTP error for {endpoint.url} {endpoint.http_type()}")
             return model.TestResult(endpoint, model.Severity.DANGER, "HTTP error",
                                     None, error=error, diff_request=diff_request)
-        except Exception as error:
-            log(LogLevel.error, f"Unknown error for {endpoint.url} {endpoint.http_type()}")
-            return model.TestResult(endpoint, model.Severity.WARNING, "Unknown error",
-                                    None, error=error, diff_request=diff_request)
+
+        log(LogLevel.error, f"Unknown error for {endpoint.url} {endpoint.http_type()}")
+        return model.TestResult(endpoint, model.Severity.WARNING, "Unknown error",
+                                None, error=error, diff_request=diff_request)
+
+    def prepare_test(self, endpoint: model.Endpoint, test_type: model.TestType, override_cookies: model.PartialDictionary = None,
+                     user: int = None, block: bool = True) -> (model.HTTPRequest, Callable[[requests.Response], model.TestResult], int):
+        # request to send, its response handler and the seed its payload came from.
+        # without block payloads that aren't generated yet are made right away instead of waiting for them
+        match test_type:
+            case model.TestType.MATCH:
+                return self.prepare_match_test(endpoint, override_cookies)
+            case model.TestType.FUZZ:
+                return self.prepare_fuzz_test(endpoint, override_cookies, user, block)
+            case model.TestType.SQL:
+                return self.prepare_sqlinj_test(endpoint, override_cookies, user)
+
+    def response_handler(self, endpoint: model.Endpoint, test_type: model.TestType, request: model.HTTPRequest) -> Callable[[requests.Response], model.TestResult]:
+        if test_type == model.TestType.MATCH:
+            return self.match_handler(endpoint, request)
+        return self.payload_handler(endpoint, request)
+
+    def run_test(self, endpoint: model.Endpoint, test_type: model.TestType, override_cookies: model.PartialDictionary = None,
+                 user: int = None) -> model.TestResult:
+        request, handler, seed = self.prepare_test(endpoint, test_type, override_cookies, user)
+        result = self.handle_request(endpoint, handler, request)
+        result.test_type = test_type
+        result.seed = seed
+        result.user = user
+        return result
+
+    def replay_test(self, failed: model.TestResult) -> model.TestResult:
+        # the recorded request sent again as it was, checked like the test that produced it
+        request = failed.diff_request
+        handler = self.response_handler(failed.endpoint, failed.test_type or model.TestType.MATCH, request)
+        result = self.handle_request(failed.endpoint, handler, request)
+        result.test_type = failed.test_type
+        result.seed = failed.seed
+        result.user = failed.user
+        return result
+
+    def next_seed(self, endpoint: model.Endpoint, test_type: model.TestType, user: int = None) -> int:
+        # for requests not generated ahead by self.payloads
+        with self.seed_lock:
+            key = (id(endpoint), test_type, user)
+            index = self.request_counts.get(key, 0)
+            self.request_counts[key] = index + 1
+        return request_seed(self.seed, self.positions.get(id(endpoint), -1), test_type, index, user)
 
     def match_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None) -> model.TestResult:
-        def value_lower(t):
-            (k, v) = t
-            return (k, v.lower())
+        return self.run_test(endpoint, model.TestType.MATCH, override_cookies)
 
+    def prepare_match_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None) -> (model.HTTPRequest, Callable[[requests.Response], model.TestResult], int):
         request = deepcopy(endpoint.interaction.request)
 
         if override_cookies is not None:
             request.cookies = deepcopy(override_cookies)
 
+        return request, self.match_handler(endpoint, request), None
+
+    def match_handler(self, endpoint: model.Endpoint, request: model.HTTPRequest) -> Callable[[requests.Response], model.TestResult]:
+        def value_lower(t):
+            (k, v) = t
+            return (k, v.lower())
+
         def handle_response(response: requests.Response):
             model_http_response = response_convert(response)
             expected_response_header_set = set(map(value_lower, endpoint.interaction.response.headers.get().items()))  # response headers but values are lowercase
@@ -212,16 +411,17 @@ class Controller:
             severity = model.Severity.OK
             
             # if specified status isn't client error we check for errors in response
-            if not endpoint.interaction.response.http_status.is_client_error and match_errors(model_http_response.body):
+            if not endpoint.interaction.response.http_status.is_client_error and (error := response_errors(response, model_http_response.body)) is not None:
+                log(LogLevel.debug, f"Found \"{error.signature}\" at {error.start} in response from {endpoint.url}")
                 verdict = "Found errors in response"
                 severity = model.Severity.CRITICAL
             elif model_http_response.http_status.is_server_error:
                 verdict = "Server error in status found"
                 severity = model.Severity.CRITICAL
-            elif endpoint.interaction.response.body_type != model_http_response.body_type:
+            elif endpoint.interaction.response.body_type != confirm_body_type(model_http_response):
                 verdict = "Unmatched body type"
                 severity = model.Severity.CRITICAL
-            elif endpoint.interaction.response.body != "" and endpoint.interaction.response.body != model_http_response.body:
+            elif endpoint.interaction.response.body != "" and not bodies_equal(endpoint.interaction.response, model_http_response):
                 verdict = "Unmatched body"
                 severity = model.Severity.CRITICAL
             elif endpoint.interaction.response.http_status != HTTPStatus(response.status_code):
@@ -239,29 +439,29 @@ class Controller:
             return model.TestResult(endpoint, severity, verdict,
                                     response.elapsed, request, model_http_response)
     
-        return self.handle_request(endpoint, handle_response, request)
+        return handle_response
 
     def fuzz_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None) -> model.TestResult:
-        request = deepcopy(endpoint.interaction.request)
-
-        # generating request body
-        match request.body_type:
-            case model.RequestBodyType.FORM_DATA:
-                for elem in request.body.elements:  # should be a dictionary
-                    if elem.enabled:
-                        elem.value = rstr.rstr(string.printable)
+        return self.run_test(endpoint, model.TestType.FUZZ, override_cookies)
 
-            case model.RequestBodyType.RAW:
-                request.body = rstr.rstr(string.printable)
+    def prepare_fuzz_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None,
+                          user: int = None, block: bool = True) -> (model.HTTPRequest, Callable[[requests.Response], model.TestResult], int):
+        request = deepcopy(endpoint.interaction.request)
 
-            case model.RequestBodyType.JSON:
-                # log(LogLevel.warning, "Proper json fuzzing not implemented right now")
-                request.body = json.dumps(fuzz_json(json.loads(request.body)))
-                # request.body = rstr.rstr(string.printable)
+        # generating request body, usually it was generated ahead of time
+        generated = None if self.payloads is None else self.payloads.get(endpoint, block)
+        seed, payload = generated if generated is not None else (self.next_seed(endpoint, model.TestType.FUZZ, user), None)
+        if payload is None:
+            payload = make_payload(request.body_type, payload_source(request), seed)
+        apply_payload(request, payload)
 
         if override_cookies is not None:
             request.cookies = deepcopy(override_cookies)
 
+        return request, self.payload_handler(endpoint, request), seed
+
+    def payload_handler(self, endpoint: model.Endpoint, request: model.HTTPRequest) -> Callable[[requests.Response], model.TestResult]:
+        # fuzz and SQL injection responses are checked the same way
         def handle_response(response: requests.Response):
             model_http_response = response_convert(response)
 
@@ -269,10 +469,11 @@ class Controller:
             severity = model.Severity.OK
             
             # if status isn't client error we check for errors in response
-            if not model_http_response.http_status.is_client_error and match_errors(model_http_response.body):
+            if not model_http_response.http_status.is_client_error and (error := response_errors(response, model_http_response.body)) is not None:
+                log(LogLevel.debug, f"Found \"{error.signature}\" at {error.start} in response from {endpoint.url}")
                 verdict = "Found non-client errors in response"
                 severity = model.Severity.CRITICAL
-            elif endpoint.interaction.response.body_type != model_http_response.body_type:
+            elif endpoint.interaction.response.body_type != confirm_body_type(model_http_response):
                 verdict = "Unmatched body type"
                 severity = model.Severity.CRITICAL
             elif model_http_response.http_status.is_server_error:
@@ -282,132 +483,272 @@ class Controller:
             return model.TestResult(endpoint, severity, verdict,
                                     response.elapsed, request, model_http_response)
 
-        return self.handle_request(endpoint, handle_response, request)
+        return handle_response
 
     def sqlinj_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None) -> model.TestResult:
+        return self.run_test(endpoint, model.TestType.SQL, override_cookies)
+
+    def prepare_sqlinj_test(self, endpoint: model.Endpoint, override_cookies: model.PartialDictionary = None,
+                            user: int = None) -> (model.HTTPRequest, Callable[[requests.Response], model.TestResult], int):
         request = deepcopy(endpoint.interaction.request)
 
         # generating request body
+        seed = self.next_seed(endpoint, model.TestType.SQL, user)
+        rng = random.Random(seed)
         wordlist = endpoint.sqlinj_test.wordlist.get()
         match request.body_type:
             case model.RequestBodyType.FORM_DATA:
                 for elem in request.body.elements:  # should be a dictionary
                     if elem.enabled:
-                        elem.value = wordlist[random.randint(0, len(wordlist) - 1)]
+                        elem.value = wordlist.sample(rng)
             case model.RequestBodyType.RAW:
-                request.body = wordlist[random.randint(0, len(wordlist) - 1)]
+                request.body = wordlist.sample(rng)
             case model.RequestBodyType.JSON:
-                request.body = json.dumps(fuzz_json(json.loads(request.body), lambda: wordlist[random.randint(0, len(wordlist) - 1)]))
+                request.body = compile_json(request.body).render(lambda: wordlist.sample(rng), rng)
 
         if override_cookies is not None:
             request.cookies = deepcopy(override_cookies)
 
-        def handle_response(response: requests.Response):
-            model_http_response = response_convert(response)
+        return request, self.payload_handler(endpoint, request), seed
 
-            verdict = "Got expected response"
-            severity = model.Severity.OK
-            
-            # if status isn't client error we check for errors in response
-            if not model_http_response.http_status.is_client_error and match_errors(model_http_response.body):
-                verdict = "Found non-client errors in response"
-                severity = model.Severity.CRITICAL
-            elif endpoint.interaction.response.body_type != model_http_response.body_type:
-                verdict = "Unmatched body type"
-                severity = model.Severity.CRITICAL
-            elif model_http_response.http_status.is_server_error:
-                verdict = "Server error in status found"
-                severity = model.Severity.CRITICAL
+    def begin_run(self, generate: bool = True, incremental: bool = False, users: int = 1):  # without fuzz payload generation for replays
+        self.in_progress = True
+        self.progress = 0
+        self.concurrency = None
+        self.metrics = RunMetrics()
+
+        if incremental:
+            self.wait_loading()  # all earlier results are needed
+        self.fingerprints = {id(endpoint): sys.intern(endpoint_fingerprint(endpoint)) for endpoint in self.model.endpoints}
+        carried = self.unchanged_results() if incremental else []
+        self.carried = set(map(lambda result: id(result.endpoint), carried))
+        self.run = max((result.run for result in self.model.results if result.run is not None), default=0) + 1
+
+        self.close_results()
+        database = None
+        if self.model.run_options.result_database != "":
+            try:
+                database = ResultStore(self.model.run_options.result_database, clear=True)
+            except Exception as e:
+                log(LogLevel.error, f"Failed opening results database, keeping results in memory: {str(e)}")
+        self.model.results = model.ResultLog(database=database)
+        self.model.results.extend(carried)
+        self.filter_results()
+        if incremental:
+            log(LogLevel.info, f"Carried over {len(carried)} results of {len(self.carried)} unchanged endpoints")
 
-            return model.TestResult(endpoint, severity, verdict,
-                                    response.elapsed, request, model_http_response)
+        self.seed = self.model.run_options.seed or random.randrange(1, 2 ** 31)  # fits the gui's int input
+        self.positions = {id(endpoint): position for position, endpoint in enumerate(self.model.endpoints)}
+        self.request_counts = {}
+        log(LogLevel.info, f"Run seed: {self.seed}")
 
-        return self.handle_request(endpoint, handle_response, request)
+        self.payloads = PayloadGenerator(self.model.run_options.payload_processes, seed=self.seed)
+        for endpoint in self.model.enabled_endpoints():
+            if generate and endpoint.fuzz_test is not None and id(endpoint) not in self.carried:
+                self.payloads.add(endpoint, endpoint.fuzz_test.count, self.positions[id(endpoint)])
+        self.payloads.start()
+
+        self.sessions.grow(max(self.workers, users))  # before the stats, they'd count from there
+        self.connection_stats = self.sessions.stats()
+        self.decode_stats = decoding.stats()
+        self.wordlist_stats = model.Wordlist.cache.stats()
+        self.preload_wordlists(self.model.enabled_endpoints()).join()  # quick if already loaded
+        logs.event("run_started", {"endpoints": len(self.model.enabled_endpoints()), "seed": self.seed, "run": self.run,
+                                   "carried": len(carried)})
+
+    def end_run(self):
+        self.connection_stats = self.sessions.stats() - self.connection_stats
+        log(LogLevel.info, f"Connection reuse: {self.connection_stats}")
+        self.decode_stats = decoding.stats() - self.decode_stats
+        log(LogLevel.info, f"Decoding: {self.decode_stats}")
+        self.wordlist_stats = model.Wordlist.cache.stats() - self.wordlist_stats
+        log(LogLevel.info, f"Wordlist cache: {self.wordlist_stats}")
+
+        self.payloads.close()
+        if (throughput := self.payloads.throughput()) is not None:
+            log(LogLevel.info, f"Generated {self.payloads.generated} fuzz payloads, {throughput:.0f} per CPU second")
+
+        logs.event("run_finished", {"results": len(self.model.results), "requests": self.connection_stats.requests,
+                                    "connections": self.connection_stats.connections,
+                                    "decode_fallbacks": self.decode_stats.fallback,
+                                    "wordlist_misses": self.wordlist_stats.misses,
+                                    "payloads": self.payloads.generated, "payloads_per_second": throughput})
 
-    def run_default_tests(self):
-        self.in_progress = True
-        self.progress = 0
+        self.progress = 1
+        self.in_progress = False
+        self.update_results()
+
+    def unchanged_results(self) -> list[model.TestResult]:
+        # results of enabled endpoints that all passed, with every test done on the endpoint as it is now
+        tested = {}
+        for result in self.model.results:
+            tested.setdefault(id(result.endpoint), []).append(result)
+
+        ret = []
+        for endpoint in self.model.enabled_endpoints():
+            results = tested.get(id(endpoint), [])
+            fingerprint = self.fingerprints[id(endpoint)]
+            if len(results) == test_count(endpoint) and all(map(lambda r: r.fingerprint == fingerprint and r.severity == model.Severity.OK, results)):
+                ret.extend(results)
+        return ret
+
+    def add_result(self, result: model.TestResult):
+        result.run = self.run
+        result.fingerprint = self.fingerprints.get(id(result.endpoint))
+        self.model.results.append(result)
+        self.metrics.record(result_key(result), result_latency(result))
+        self.observe(result)
+
+    def observe(self, result: model.TestResult):
+        if self.concurrency is None:
+            return
+
+        latency = result_latency(result)
+        failed = isinstance(result.error, (requests.Timeout, requests.ConnectionError))
+        self.concurrency.on_result(latency, failed)
 
-        thrs = []
-        results = []
+    def host_limits(self) -> dict:
+        return host_limits(self.model.enabled_endpoints(), self.model.run_options.rate_limit)
+
+    def default_tests(self) -> list[(model.Endpoint, model.TestType)]:
+        tests = []
         for endpoint in self.model.enabled_endpoints():
+            if id(endpoint) in self.carried:
+                continue
             if endpoint.match_test:
                 log(LogLevel.info, f"Starting match test for {endpoint.url} {endpoint.http_type()}")
-                thrs.append(self.thread_pool.submit(Controller.match_test, self, endpoint))
+                tests.append((endpoint, model.TestType.MATCH))
             if endpoint.fuzz_test is not None:
                 for i in range(0, endpoint.fuzz_test.count):
                     log(LogLevel.info, f"Starting fuzz test for {endpoint.url} {endpoint.http_type()}")
-                    thrs.append(self.thread_pool.submit(Controller.fuzz_test, self, endpoint))
+                    tests.append((endpoint, model.TestType.FUZZ))
             if endpoint.sqlinj_test is not None:
                 for i in range(0, endpoint.sqlinj_test.count):
                     log(LogLevel.info, f"Starting SQL injection test for {endpoint.url} {endpoint.http_type()}")
-                    thrs.append(self.thread_pool.submit(Controller.sqlinj_test, self, endpoint))
+                    tests.append((endpoint, model.TestType.SQL))
+        return tests
+
+    def run_default_tests(self):
+        self.begin_run(incremental=self.model.run_options.incremental)
+        self.run_scheduled([(endpoint.url, Controller.run_test, endpoint, test_type) for endpoint, test_type in self.default_tests()])
+        self.end_run()
+
+    def failures(self, min_severity: model.Severity = model.Severity.CRITICAL) -> list[model.TestResult]:
+        self.wait_loading()
+        return [result for result in self.model.results if result.severity.value >= min_severity.value]
+
+    def replay_failures(self, min_severity: model.Severity = model.Severity.CRITICAL):
+        # sends only the requests of failed results again, byte for byte, to check a fix without a full run
+        failed = self.failures(min_severity)
+        if failed == []:
+            log(LogLevel.warning, "No failed results to replay")
+            return
+
+        log(LogLevel.info, f"Replaying {len(failed)} failed requests")
+        self.begin_run(generate=False)
+        self.run_scheduled([(result.endpoint.url, Controller.replay_test, result) for result in failed])
+        self.end_run()
+
+    def start_replay(self, min_severity: model.Severity = model.Severity.CRITICAL) -> futures.Future:
+        return self.thread_pool.submit(Controller.replay_failures, self, min_severity)
 
-        count = len(thrs)
-        for thr in thrs:
+    def run_scheduled(self, tests: list[tuple]):  # (url, function, *args), function is called with the controller first
+        if self.model.run_options.adaptive_concurrency:
+            self.concurrency = AdaptiveLimit(self.workers - 1)  # one worker runs this loop
+
+        self.scheduler = Scheduler(self.thread_pool, self.host_limits(), self.workers, self.concurrency)
+        for url, function, *args in tests:
+            self.scheduler.add(url, function, self, *args)
+
+        count = self.scheduler.queued()
+        for thr in self.scheduler.run():
             try:
-                results.append(thr.result(timeout=None))
+                result = thr.result(timeout=None)
+                self.add_result(result)
                 self.progress += 1 / count
             except Exception as error:
                 log(LogLevel.error, error)
 
-        self.model.results = results
-        self.progress = 1
-        self.in_progress = False
-        self.filter_results()
+        self.scheduler = None
 
-    def run_dynamic_tests(self):
-        self.in_progress = True
-        self.progress = 0
+    def run_async_tests(self):
+        from .async_engine import AsyncEngine  # aiohttp is only loaded when the engine is selected
 
-        results = []
-        
-        max_count = 0
+        self.begin_run(incremental=self.model.run_options.incremental)
 
-        for endpoint in self.model.enabled_endpoints():
-            if endpoint.match_test:
-                max_count += 1
-            if endpoint.fuzz_test is not None:
-                max_count += endpoint.fuzz_test.count
-            if endpoint.sqlinj_test is not None:
-                max_count += endpoint.sqlinj_test.count
+        if self.model.run_options.adaptive_concurrency:
+            self.concurrency = AdaptiveLimit(self.model.run_options.max_in_flight)
+
+        self.async_engine = AsyncEngine(self, self.model.run_options.max_in_flight, self.host_limits(), self.concurrency)
+        self.async_engine.run(self.default_tests())
+        self.async_engine = None
 
-        cookies = model.PartialDictionary()
-        if self.model.dynamic_options.use_initial_values:
-            cookies = self.model.dynamic_options.initial_cookies
+        self.end_run()
+
+    def run_dynamic_tests(self):
+        users = model.clamp_virtual_users(self.model.dynamic_options.virtual_users)
+        self.begin_run(generate=users == 1, users=users)  # several users make their payloads from their own seeds
 
+        limits = self.host_limits()
+        limiters = {}  # rate limits and requests in flight per host still apply, shared by all users
         for endpoint in self.model.enabled_endpoints():
-            if endpoint.match_test:
-                log(LogLevel.info, f"Starting match test for {endpoint.url} {endpoint.http_type()}")
-                results.append(self.match_test(endpoint, cookies))
-                if results[-1].severity == model.Severity.OK:
-                    cookies = model.PartialDictionary.merge(cookies, results[-1].response.cookies)
-                self.progress += 1 / max_count
-            if endpoint.fuzz_test is not None:
-                for i in range(0, endpoint.fuzz_test.count):
-                    log(LogLevel.info, f"Starting fuzz test for {endpoint.url} {endpoint.http_type()}")
-                    results.append(self.fuzz_test(endpoint, cookies))
-                    if results[-1].severity == model.Severity.OK:
-                        cookies = model.PartialDictionary.merge(cookies, results[-1].response.cookies)
-                    self.progress += 1 / max_count
-            if endpoint.sqlinj_test is not None:
-                for i in range(0, endpoint.sqlinj_test.count):
-                    log(LogLevel.info, f"Starting SQL injection test for {endpoint.url} {endpoint.http_type()}")
-                    results.append(self.sqlinj_test(endpoint, cookies))
-                    if results[-1].severity == model.Severity.OK:
-                        cookies = model.PartialDictionary.merge(cookies, results[-1].response.cookies)
-                    self.progress += 1 / max_count
+            key = host_key(endpoint.url)
+            if key not in limiters:
+                limiters[key] = HostLimiter(limits.get(key))
 
-        self.model.results = results
-        self.progress = 1
-        self.in_progress = False
-        self.filter_results()
+        total = users * sum(map(test_count, self.model.enabled_endpoints()))
+        done = itertools.count(1)
 
-    def start_testing(self):
+        def run(endpoint: model.Endpoint, test_type: model.TestType, user: int, cookies: model.PartialDictionary) -> model.PartialDictionary:
+            log(LogLevel.info, f"Starting {test_type} test for {endpoint.url} {endpoint.http_type()} as user {user}")
+            limiter = limiters[host_key(endpoint.url)]
+            limiter.start()
+            try:
+                result = self.run_test(endpoint, test_type, cookies, user)
+            finally:
+                limiter.finish()
+            self.add_result(result)
+            self.progress = next(done) / total
+            if result.severity == model.Severity.OK:
+                cookies = model.PartialDictionary.merge(cookies, result.response.cookies)
+            return cookies
+
+        def flow(user: int):  # every user goes through the endpoints in order, with its own cookies
+            cookies = model.PartialDictionary()
+            if self.model.dynamic_options.use_initial_values:
+                cookies = self.model.dynamic_options.initial_cookies
+
+            for endpoint in self.model.enabled_endpoints():
+                if endpoint.match_test and self.in_progress:
+                    cookies = run(endpoint, model.TestType.MATCH, user, cookies)
+                if endpoint.fuzz_test is not None:
+                    for i in range(0, endpoint.fuzz_test.count):
+                        if self.in_progress:
+                            cookies = run(endpoint, model.TestType.FUZZ, user, cookies)
+                if endpoint.sqlinj_test is not None:
+                    for i in range(0, endpoint.sqlinj_test.count):
+                        if self.in_progress:
+                            cookies = run(endpoint, model.TestType.SQL, user, cookies)
+
+        with futures.ThreadPoolExecutor(users, thread_name_prefix="virtual-user") as executor:
+            for future in [executor.submit(flow, user) for user in range(users)]:
+                try:
+                    future.result()
+                except Exception as error:
+                    log(LogLevel.error, error)
+
+        self.end_run()
+
+    def run_testing(self):
         if self.model.dynamic_options is not None:
-            self.thread_pool.submit(Controller.run_dynamic_tests, self)
+            self.run_dynamic_tests()
+        elif self.model.run_options.engine == model.Engine.ASYNCIO:
+            self.run_async_tests()
         else:
-            self.thread_pool.submit(Controller.run_default_tests, self)
+            self.run_default_tests()
+
+    def start_testing(self) -> futures.Future:
+        return self.thread_pool.submit(Controller.run_testing, self)
 
     def cancel_testing(self):
         if not self.in_progress:
@@ -417,11 +758,20 @@ class Controller:
         # for thr in self.thread_pool._threads:
         #     thr.join(timeout=0)
 
+        if self.async_engine is not None:
+            self.async_engine.cancel()
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+        if self.payloads is not None:
+            self.payloads.close()
+        self.in_progress = False  # virtual users check it before each request, shutdown waits for them
+
         self.thread_pool.shutdown(cancel_futures=True)
-        self.thread_pool = futures.ThreadPoolExecutor()
-            
-        self.in_progress = False
+        self.thread_pool = futures.ThreadPoolExecutor(self.workers)
         log(LogLevel.info, "Testing canceled")
     
     def cleanup(self):
         self.cancel_testing()
+        self.thread_pool.shutdown()  # every controller has its own
+        self.sessions.close()
+        self.close_results()
@@ -0,0 +1,82 @@
+import codecs
+import functools
+import re
+import threading
+
+CHARSET = re.compile(r"""charset\s*=\s*["']?([^\s"';,]+)""", re.IGNORECASE)
+FALLBACK_ENCODING = "latin-1"  # never fails and costs the same as utf-8, requests defaults to it for text too
+
+
+class DecodeStats:
+    def __init__(self, declared: int = 0, utf8: int = 0, fallback: int = 0):
+        self.declared = declared  # decoded with the charset from Content-Type
+        self.utf8 = utf8  # no charset, but valid utf-8
+        self.fallback = fallback  # no charset and not utf-8, the slow path
+
+    def total(self) -> int:
+        return self.declared + self.utf8 + self.fallback
+
+    def __sub__(self, other):  # -> DecodeStats:
+        return DecodeStats(self.declared - other.declared, self.utf8 - other.utf8, self.fallback - other.fallback)
+
+    def __str__(self) -> str:
+        return f"{self.total()} bodies, {self.declared} with declared charset, {self.utf8} utf-8, {self.fallback} fallback"
+
+
+counts = DecodeStats()
+counts_lock = threading.Lock()
+
+
+def stats() -> DecodeStats:
+    with counts_lock:
+        return DecodeStats(counts.declared, counts.utf8, counts.fallback)
+
+
+def count(kind: str) -> ():
+    with counts_lock:
+        setattr(counts, kind, getattr(counts, kind) + 1)
+
+
+@functools.lru_cache(maxsize=64)
+def normalize(charset: str) -> str:  # codec name, None if python doesn't know it
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def declared_charset(content_type: str) -> str:
+    # only an explicit charset parameter, unlike requests which assumes latin-1 for any text/*
+    if not content_type:
+        return None
+    match = CHARSET.search(content_type)
+    if match is None:
+        return None
+    return normalize(match.group(1))
+
+
+@functools.lru_cache(maxsize=64)
+def ascii_compatible(charset: str) -> bool:
+    # ascii signatures can be searched in raw bytes when they're encoded as themselves
+    sample = "Fatal error: <b>\n"
+    try:
+        return sample.encode(charset or "utf-8") == sample.encode("ascii")
+    except (LookupError, UnicodeError):
+        return False
+
+
+def decode(content: bytes, content_type: str) -> str:
+    # declared charset first, then utf-8, then a single byte fallback. never guesses the
+    # encoding from content like requests' Response.text does
+    charset = declared_charset(content_type)
+    if charset is not None:
+        count("declared")
+        return content.decode(charset, errors="replace")
+
+    try:
+        text = content.decode("utf-8")
+        count("utf8")
+        return text
+    except UnicodeDecodeError:
+        count("fallback")
+        return content.decode(FALLBACK_ENCODING)
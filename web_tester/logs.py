@@ -0,0 +1,78 @@
+from enum import Enum
+from collections import deque
+import logging
+import threading
+import time
+
+
+class LogLevel(Enum):
+    debug = logging.DEBUG
+    info = logging.INFO
+    warning = logging.WARNING
+    error = logging.ERROR
+
+
+class Sink:
+    # receives log messages and structured events (like run start/finish) from the core
+    def log(self, level: LogLevel, message: str) -> ():
+        pass
+
+    def event(self, name: str, data: dict) -> ():
+        pass
+
+
+class StdlibSink(Sink):
+    def __init__(self, logger: logging.Logger = logging.getLogger("web_tester")):
+        self.logger = logger
+
+    def log(self, level: LogLevel, message: str) -> ():
+        self.logger.log(level.value, message)
+
+    def event(self, name: str, data: dict) -> ():
+        self.logger.debug(f"{name} {data}")
+
+
+class MemorySink(Sink):
+    # keeps last messages and events, cheap enough for worker processes
+    def __init__(self, capacity: int = 1000):
+        self.messages = deque(maxlen=capacity)
+        self.events = deque(maxlen=capacity)
+
+    def log(self, level: LogLevel, message: str) -> ():
+        self.messages.append((time.time(), level, message))
+
+    def event(self, name: str, data: dict) -> ():
+        self.events.append((time.time(), name, data))
+
+
+sinks = [StdlibSink()]
+sinks_lock = threading.Lock()
+
+
+def add_sink(sink: Sink) -> ():
+    global sinks
+    with sinks_lock:
+        sinks = sinks + [sink]  # copy so logging threads never see a half updated list
+
+
+def remove_sink(sink: Sink) -> ():
+    global sinks
+    with sinks_lock:
+        sinks = [s for s in sinks if s is not sink]
+
+
+def set_sinks(new_sinks: list[Sink]) -> ():
+    global sinks
+    with sinks_lock:
+        sinks = list(new_sinks)
+
+
+def log(level: LogLevel, message: str) -> ():
+    message = str(message)
+    for sink in sinks:
+        sink.log(level, message)
+
+
+def event(name: str, data: dict = {}) -> ():
+    for sink in sinks:
+        sink.event(name, data)
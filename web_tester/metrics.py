@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+
+
+class LatencyHistogram:
+    # log spaced buckets keep relative error under `accuracy` with a bounded bucket count
+    # (about 1200 between 1µs and 1h at 2%), histograms with same accuracy can be merged
+    lowest = 0.000001  # 1µs
+
+    def __init__(self, accuracy: float = 0.02):
+        self.accuracy = accuracy
+        self.base = math.log1p(accuracy)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value: float) -> int:
+        return max(0, int(math.log(max(value, self.lowest) / self.lowest) / self.base))
+
+    def bucket_value(self, index: int) -> float:  # middle of the bucket
+        return self.lowest * math.exp((index + 0.5) * self.base)
+
+    def record(self, value: float) -> ():
+        index = self.bucket(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other) -> ():  # other: LatencyHistogram
+        if other.accuracy != self.accuracy:
+            raise ValueError("can't merge histograms with different accuracy")
+
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count > 0:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        if self.count == 0:
+            return None
+
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, max(self.min, self.bucket_value(index)))
+        return self.max
+
+    def mean(self) -> float:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+
+class LatencyStats:
+    def __init__(self, name: str, histogram: LatencyHistogram, errors: int, throughput: float):
+        self.name = name
+        self.count = histogram.count
+        self.errors = errors
+        self.p50 = histogram.percentile(50)
+        self.p90 = histogram.percentile(90)
+        self.p99 = histogram.percentile(99)
+        self.max = histogram.max
+        self.throughput = throughput  # requests per second, None when run time is unknown
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class RunMetrics:
+    # latency per (endpoint, test type), memory doesn't depend on request count.
+    # untimed metrics are for results that weren't just received, they have no throughput
+    def __init__(self, timed: bool = True):
+        self.timed = timed
+        self.histograms = {}
+        self.errors = {}
+        self.start = None
+        self.end = None
+        self.lock = threading.Lock()
+
+    def record(self, key: (str, str), latency: float) -> ():  # latency None for failed requests
+        with self.lock:
+            if self.timed:
+                now = time.monotonic()
+                if self.start is None:
+                    self.start = now
+                self.end = now
+
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+                self.errors[key] = 0
+
+            if latency is None:
+                self.errors[key] += 1
+            else:
+                self.histograms[key].record(latency)
+
+    def elapsed(self) -> float:
+        if self.start is None:
+            return None
+        return self.end - self.start
+
+    def stats(self) -> list[LatencyStats]:  # one per key and a total row at the end
+        with self.lock:
+            elapsed = self.elapsed()
+
+            def throughput(count: int) -> float:
+                if elapsed is None or elapsed <= 0:
+                    return None
+                return count / elapsed
+
+            ret = []
+            total = LatencyHistogram()
+            for key in sorted(self.histograms):
+                histogram = self.histograms[key]
+                total.merge(histogram)
+                ret.append(LatencyStats(' '.join(key), histogram, self.errors[key], throughput(histogram.count + self.errors[key])))
+
+            errors = sum(self.errors.values())
+            ret.append(LatencyStats("Total", total, errors, throughput(total.count + errors)))
+            return ret
+
+    @classmethod
+    def from_results(cls, results: list):  # -> RunMetrics: without run timing, so no throughput
+        ret = RunMetrics(timed=False)
+        for result in results:
+            ret.record(result_key(result), result_latency(result))
+        return ret
+
+
+def result_key(result) -> (str, str):
+    return (f"{result.endpoint.url} {result.endpoint.http_type()}", str(result.test_type or ""))
+
+
+def result_latency(result) -> float:
+    if result.elapsed_time is None:
+        return None
+    return result.elapsed_time.total_seconds()
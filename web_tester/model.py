@@ -2,17 +2,22 @@ from typing import Union
 from enum import Enum, StrEnum
 from copy import deepcopy
 
+from array import array
+
 import validators
 import json
 import datetime
+import bisect
+import itertools
+import sys
+import threading
 
 from http import HTTPStatus
 
 import _pickle as pickle
 
-from imgui_bundle import hello_imgui
-log = hello_imgui.log
-LogLevel = hello_imgui.LogLevel
+from .logs import log, LogLevel
+from .wordlists import MappedWordlist, WordlistCache
 
 
 class HTTPType(StrEnum):
@@ -28,6 +33,19 @@ class RequestBodyType(StrEnum):
     FORM_DATA = "FORM_DATA"
 
 
+class Slotted:
+    # objects kept per result, without a __dict__ each. pickles of versions that had one still load
+    __slots__ = ()
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__ if hasattr(self, k)}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            if k in self.__slots__:
+                setattr(self, k, v)
+
+
 class PartialDictionary:
     class Element:
         def __init__(self, key: str, value: str, enabled: bool) -> ():
@@ -133,18 +151,22 @@ class ResponseBodyType(StrEnum):
     RAW = "RAW"
 
 
-class HTTPResponse:
+class HTTPResponse(Slotted):
+    __slots__ = ("http_status", "body_type", "body", "headers", "cookies", "length", "truncated")
+
     def __init__(self,
                  http_status: HTTPStatus,
                  body_type: ResponseBodyType = ResponseBodyType.JSON, body: Union[str, PartialDictionary] = "",
-                 headers: PartialDictionary = PartialDictionary(), cookies: PartialDictionary = PartialDictionary()):
+                 headers: PartialDictionary = PartialDictionary(), cookies: PartialDictionary = PartialDictionary(),
+                 length: int = None, truncated: bool = False):
 
         self.http_status = http_status
         self.body_type = body_type
         self.body = body
         self.headers = headers
         self.cookies = cookies
-        self.prettify()
+        self.length = length  # of received body in bytes, body only holds a prefix when truncated
+        self.truncated = truncated
         
     def validate(self) -> str:
         if self.body == "" or self.body.get() == {}:
@@ -159,7 +181,18 @@ class HTTPResponse:
 
         return ""
 
+    def pretty_body(self) -> str:  # for display, received bodies are kept as they came
+        if self.body_type == ResponseBodyType.JSON and not self.truncated:
+            try:
+                return json.dumps(json.loads(self.body), indent=4)
+            except Exception:
+                pass
+        return self.body
+
     def prettify(self) -> ():
+        if self.truncated:  # only a prefix, not valid json
+            return
+
         try:
             match self.body_type:
                 case ResponseBodyType.JSON:
@@ -187,21 +220,17 @@ class Interaction:
 
 
 class Wordlist:
-    wordlists = {}  # NOTE: doesn't get saved in files
+    cache = WordlistCache()  # NOTE: doesn't get saved in files
 
     def __init__(self, filename: str):
         self.filename = filename
 
-    def get(self) -> list[str]:
-        if self.filename not in Wordlist.wordlists:
-            file = open(self.filename, "r")
-            Wordlist.wordlists[self.filename] = list(map(lambda s: s.strip(), file.readlines()))
-            file.close()
-        return Wordlist.wordlists[self.filename]
+    def get(self) -> MappedWordlist:
+        return Wordlist.cache.get(self.filename)
 
     @classmethod
     def unload(cls, filename: str) -> ():
-        cls.wordlists.pop(filename)
+        cls.cache.remove(filename)
 
 
 class FuzzTest:
@@ -218,9 +247,30 @@ class SQLInjectionTest:
         return self.wordlist.get()
 
 
+class RateLimit:
+    def __init__(self, requests_per_second: float = 10, burst: int = 1, max_in_flight: int = 0) -> ():
+        # 0 means unlimited
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+
+    @classmethod
+    def strictest(cls, a, b):  # -> RateLimit:
+        def lowest(x, y):
+            if x <= 0:
+                return y
+            if y <= 0:
+                return x
+            return min(x, y)
+
+        return RateLimit(lowest(a.requests_per_second, b.requests_per_second), min(a.burst, b.burst),
+                         lowest(a.max_in_flight, b.max_in_flight))
+
+
 class Endpoint:
     def __init__(self, url: str, interaction: Interaction, max_wait_time: int = 10,
-                 match_test: bool = True, fuzz_test: FuzzTest = FuzzTest(), sqlinj_test: SQLInjectionTest = None, enabled: bool = True) -> ():
+                 match_test: bool = True, fuzz_test: FuzzTest = FuzzTest(), sqlinj_test: SQLInjectionTest = None, enabled: bool = True,
+                 rate_limit: RateLimit = None, max_body_size: int = 0) -> ():
         self.enabled = enabled
         self.url = url
         self.interaction = interaction
@@ -228,6 +278,8 @@ class Endpoint:
         self.match_test = match_test
         self.fuzz_test = fuzz_test
         self.sqlinj_test = sqlinj_test
+        self.rate_limit = rate_limit  # applies to the whole host of the endpoint
+        self.max_body_size = max_body_size  # bytes of response read, 0 reads everything
 
     def http_type(self) -> str:
         return self.interaction.request.http_type.value
@@ -236,11 +288,11 @@ class Endpoint:
         results = []
 
         if self.match_test:
-            results.append("Match")
+            results.append(TestType.MATCH)
         if self.fuzz_test is not None:
-            results.append("Fuzz")
+            results.append(TestType.FUZZ)
         if self.sqlinj_test is not None:
-            results.append("SQL")
+            results.append(TestType.SQL)
 
         return ', '.join(results)
 
@@ -283,15 +335,30 @@ class Severity(Enum):
         return strs[self.value]
 
 
-class TestResult:
+class TestType(StrEnum):
+    MATCH = "Match"
+    FUZZ = "Fuzz"
+    SQL = "SQL"
+
+
+class TestResult(Slotted):
+    __slots__ = ("endpoint", "test_type", "severity", "verdict", "elapsed_time", "response", "error", "diff_request", "seed",
+                 "run", "fingerprint", "user")
+
     def __init__(self,
                  endpoint: Endpoint,
                  severity: Severity, verdict: str, elapsed_time: datetime.time,
                  diff_request: HTTPRequest = None, response: HTTPResponse = None,
-                 error=None) -> ():
+                 error=None, test_type: TestType = None, seed: int = None, run: int = None, fingerprint: str = None,
+                 user: int = None) -> ():
         self.endpoint = endpoint
+        self.test_type = test_type
+        self.seed = seed  # payload generator seed of the request (payloads.request_seed), None for match tests
+        self.run = run  # number of the run it came from, incremental runs carry results of unchanged endpoints over
+        self.fingerprint = None if fingerprint is None else sys.intern(fingerprint)  # of the endpoint when tested (serialization.endpoint_fingerprint)
+        self.user = user  # virtual user of a dynamic run that sent it
         self.severity = severity
-        self.verdict = verdict
+        self.verdict = sys.intern(verdict)  # few distinct verdicts shared by many results
         self.elapsed_time = elapsed_time
         self.response = response
         self.error = error
@@ -318,31 +385,201 @@ class TestResultFilter:
         self.min_severity = min_severity
 
     def use(self, tr: TestResult) -> bool:
-        ret = tr.severity.value >= self.min_severity
+        return tr.severity.value >= self.min_severity and self.use_endpoint(tr.endpoint)
+
+    def use_endpoint(self, endpoint: Endpoint) -> bool:
+        ret = True
         if self.url is not None:
-            ret &= self.url in tr.endpoint.url
+            ret &= self.url in endpoint.url
         if self.http_type is not None:
-            ret &= self.http_type == tr.endpoint.http_type()
-        
+            ret &= self.http_type == endpoint.http_type()
+
+        return ret
+
+
+class ContentStore:
+    # one shared copy of each distinct body, header and cookie set, keyed by content.
+    # a fuzz run mostly gets the same error page back, so its results point to the same objects.
+    # shared objects must not be modified, received responses and requests of results never are
+    def __init__(self) -> ():
+        self.bodies = {}
+        self.dictionaries = {}
+
+    def body(self, body):
+        if not isinstance(body, str):
+            return body
+        return self.bodies.setdefault(body, body)  # dict hashes the whole text
+
+    def dictionary(self, dictionary: PartialDictionary) -> PartialDictionary:
+        key = tuple((e.key, e.value, e.enabled) for e in dictionary.elements)
+        return self.dictionaries.setdefault(key, dictionary)
+
+    def compact(self, result: TestResult) -> ():
+        if (response := result.response) is not None:
+            response.body = self.body(response.body)
+            response.headers = self.dictionary(response.headers)
+            response.cookies = self.dictionary(response.cookies)
+
+        request = result.diff_request
+        if request is not None and request is not result.endpoint.interaction.request:  # a copy with fuzzed values
+            request.headers = self.dictionary(request.headers)
+            request.cookies = self.dictionary(request.cookies)
+
+    def __len__(self) -> int:
+        return len(self.bodies) + len(self.dictionaries)
+
+
+class ResultIndex:
+    # positions of results in a log by endpoint and severity. filters check url and http type once
+    # per endpoint instead of once per result, a run has few endpoints and many results for each
+    def __init__(self) -> ():
+        self.endpoints = {}  # id(endpoint) -> endpoint
+        self.positions = {}  # (id(endpoint), severity value) -> ascending positions
+
+    def add(self, position: int, result: TestResult) -> ():
+        key = id(result.endpoint)
+        self.endpoints.setdefault(key, result.endpoint)
+        bucket = (key, result.severity.value)
+        positions = self.positions.get(bucket)
+        if positions is None:
+            positions = self.positions[bucket] = array("Q")
+        positions.append(position)
+
+    def buckets(self, filter: TestResultFilter, start: int, end: int) -> list[array]:
+        # positions in [start, end) of every bucket passing filter, copied so appends can go on
+        matches = {key: filter.use_endpoint(endpoint) for key, endpoint in self.endpoints.items()}
+        ret = []
+        for (key, severity), positions in self.positions.items():
+            if severity >= filter.min_severity and matches[key]:
+                low, high = bisect.bisect_left(positions, start), bisect.bisect_left(positions, end)
+                if low < high:
+                    ret.append(positions[low:high])
         return ret
 
 
+class ResultLog:
+    # append-only list of results, workers append while the gui reads.
+    # with a database (result_store.ResultStore) every result is also written to disk as it arrives
+    def __init__(self, results: list[TestResult] = [], database=None) -> ():
+        self.items = []
+        self.index = ResultIndex()
+        self.store = ContentStore()
+        self.database = database
+        self.lock = threading.Lock()
+        self.add(results)
+
+    def add(self, results: list[TestResult]) -> ():  # with lock held
+        for result in results:
+            self.store.compact(result)
+            self.index.add(len(self.items), result)
+            self.items.append(result)
+
+    def append(self, result: TestResult) -> ():
+        with self.lock:
+            if self.database is not None:
+                self.database.append(result)
+            self.add([result])
+
+    def extend(self, results: list[TestResult]) -> ():  # in one transaction with a database
+        with self.lock:
+            if self.database is not None:
+                self.database.extend(results)
+            self.add(results)
+
+    def add_loaded(self, result: TestResult) -> ():  # read back from the database, not written again
+        with self.lock:
+            self.add([result])
+
+    def select(self, filter: TestResultFilter, start: int = 0) -> (list[TestResult], int):
+        # results from index start on that pass filter, and the index to continue from next time
+        with self.lock:
+            end = len(self.items)
+            if filter is None:
+                return self.items[start:end], end
+            buckets = self.index.buckets(filter, start, end)
+
+        items = self.items  # only appended to, positions before end stay valid
+        positions = buckets[0] if len(buckets) == 1 else sorted(itertools.chain.from_iterable(buckets))  # sorted runs merge quickly
+        return [items[i] for i in positions], end
+
+    def since(self, index: int) -> list[TestResult]:
+        with self.lock:
+            return self.items[index:]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return itertools.islice(self.items, len(self.items))
+
+    def __getstate__(self):
+        return {"items": self.since(0)}
+
+    def __setstate__(self, state):
+        self.items = []
+        self.index = ResultIndex()
+        self.store = ContentStore()
+        self.database = None
+        self.lock = threading.Lock()
+        self.add(state["items"])  # pickle keeps shared objects shared
+
+
+MAX_VIRTUAL_USERS = 64  # each is a thread with its own session and connections
+
+
+def clamp_virtual_users(users: int) -> int:
+    return min(max(1, users), MAX_VIRTUAL_USERS)
+
+
 class DynamicTestingOptions:
-    def __init__(self, use_initial_values: bool, initial_cookies: PartialDictionary) -> ():
+    def __init__(self, use_initial_values: bool, initial_cookies: PartialDictionary, virtual_users: int = 1) -> ():
         self.use_initial_values = use_initial_values
         self.initial_cookies = initial_cookies
+        self.virtual_users = virtual_users  # each goes through the endpoints in parallel with its own cookies
 
     @classmethod
     def default(cls):
         return DynamicTestingOptions(False, PartialDictionary())
 
 
+class Engine(StrEnum):
+    THREADS = "THREADS"
+    ASYNCIO = "ASYNCIO"
+
+
+class RunOptions:
+    def __init__(self, engine: Engine = Engine.THREADS, max_in_flight: int = 1000, rate_limit: RateLimit = None,
+                 adaptive_concurrency: bool = False, payload_processes: int = 0, result_database: str = "",
+                 wordlist_memory: int = 256, seed: int = 0, incremental: bool = False) -> ():
+        self.engine = engine
+        self.max_in_flight = max_in_flight  # only used by asyncio engine
+        self.rate_limit = rate_limit  # default per host limit for endpoints without one
+        self.adaptive_concurrency = adaptive_concurrency  # requests in flight follow target latency and errors
+        self.payload_processes = payload_processes  # fuzz payloads are generated ahead in a thread if 0
+        self.result_database = result_database  # sqlite file results are written to as they arrive, "" keeps them in memory only
+        self.wordlist_memory = wordlist_memory  # MiB of wordlists kept mapped, least recently used are dropped over it
+        self.seed = seed  # payloads of runs with the same seed are the same, 0 picks a new one every run
+        self.incremental = incremental  # only test endpoints that changed or didn't pass last time, not for dynamic testing
+
+    @classmethod
+    def default(cls):
+        return RunOptions()
+
+
 class Model:
-    def __init__(self, endpoints: list[Endpoint] = [], results: list[TestResult] = [], dynamic_options: DynamicTestingOptions = None):
+    def __init__(self, endpoints: list[Endpoint] = [], results: list[TestResult] = [], dynamic_options: DynamicTestingOptions = None,
+                 run_options: RunOptions = None):
         self.endpoints = endpoints
-        self.results = results
+        self.results = ResultLog(results)
         self.dynamic_options = dynamic_options
 
+        self.run_options = run_options
+        if self.run_options is None:
+            self.run_options = RunOptions.default()
+
     def add_endpoint(self, endpoint: Endpoint):
         return self.endpoints.append(endpoint)
 
@@ -352,11 +589,43 @@ class Model:
     def enabled_endpoints(self) -> list[Endpoint]:
         return list(filter(lambda x: x.enabled, self.endpoints))
 
-    def save(self, filename: str):
-        with open(filename, 'wb') as output:
-            return pickle.dump(self, output, -1)
-
     @staticmethod
-    def load(filename: str):
+    def load_pickle(filename: str):  # project files before the versioned format (project.py)
         with open(filename, 'rb') as input:
-            return pickle.load(input)
+            ret = pickle.load(input)
+
+        # for files previous version
+        if not hasattr(ret, "run_options"):
+            ret.run_options = RunOptions.default()
+        for k, v in vars(RunOptions.default()).items():
+            if not hasattr(ret.run_options, k):
+                setattr(ret.run_options, k, v)
+        if not hasattr(ret, "dynamic_options"):
+            ret.dynamic_options = None
+        if ret.dynamic_options is not None and not hasattr(ret.dynamic_options, "virtual_users"):
+            ret.dynamic_options.virtual_users = 1
+        for endpoint in ret.endpoints:
+            if not hasattr(endpoint, "enabled"):
+                endpoint.enabled = True
+            if not hasattr(endpoint, "rate_limit"):
+                endpoint.rate_limit = None
+            if not hasattr(endpoint, "max_body_size"):
+                endpoint.max_body_size = 0
+        if not isinstance(ret.results, ResultLog):
+            ret.results = ResultLog(ret.results)
+        for result in ret.results:
+            if not hasattr(result, "test_type"):
+                result.test_type = None
+            if not hasattr(result, "seed"):
+                result.seed = None
+            if not hasattr(result, "run"):
+                result.run = None
+                result.fingerprint = None
+            if not hasattr(result, "user"):
+                result.user = None
+        responses = [e.interaction.response for e in ret.endpoints] + [r.response for r in ret.results if r.response is not None]
+        for response in responses:
+            if not hasattr(response, "truncated"):
+                response.length = None
+                response.truncated = False
+        return ret
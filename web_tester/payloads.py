@@ -0,0 +1,287 @@
+from collections import deque
+from concurrent import futures
+
+from json.encoder import encode_basestring_ascii
+
+import functools
+import hashlib
+import json
+import multiprocessing
+import random
+import rstr
+import string
+import threading
+import time
+
+from . import model
+from .logs import log, LogLevel
+
+
+def request_seed(seed: int, position: int, test_type: model.TestType, index: int, user: int = None) -> int:
+    # seed of the index-th request of a test type for the endpoint at position in the project, virtual users
+    # of dynamic runs count their own. each request gets its own generator, so payloads are the same
+    # whichever thread or process makes them
+    key = f"{seed}:{position}:{test_type}:{index}" + ("" if user is None else f":{user}")
+    key = key.encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def printable(rng: random.Random):
+    return functools.partial(rstr.Rstr(rng).rstr, string.printable)
+
+
+generators = threading.local()  # reseeded per payload, building an Rstr costs more than the seeding
+
+
+def seeded(seed: int) -> (random.Random, callable):
+    if not hasattr(generators, "rng"):
+        generators.rng = random.Random()
+        generators.rand = printable(generators.rng)
+    generators.rng.seed(seed)
+    return generators.rng, generators.rand
+
+
+def fuzz_json(json_body, rand=lambda: rstr.rstr(string.printable), rng: random.Random = random):
+    if isinstance(json_body, dict):
+        return {k: fuzz_json(v, rand, rng) for k, v in json_body.items()}
+    if isinstance(json_body, list):
+        return [fuzz_json(item, rand, rng) for item in json_body]
+    if isinstance(json_body, str):
+        return rand()
+    if isinstance(json_body, bool):  # before int, bool is a subclass of it
+        return rng.random() >= 0.5
+    if isinstance(json_body, int):
+        return round(rng.random() * 100) - 50
+    if isinstance(json_body, float):
+        return rng.random() * 100 - 50
+
+    return json_body
+
+
+def fuzz_leaf(kind: type, rand, rng: random.Random = random) -> str:  # serialized the same way json.dumps does
+    if kind is str:
+        return encode_basestring_ascii(rand())
+    if kind is bool:
+        return "true" if rng.random() >= 0.5 else "false"
+    if kind is int:
+        return str(round(rng.random() * 100) - 50)
+    return repr(rng.random() * 100 - 50)
+
+
+class JsonTemplate:
+    # json body split once into literal text and typed leaves, rendering only fills the leaves
+    # so there is no parsing or copying per payload. output matches json.dumps(fuzz_json(body))
+    def __init__(self, json_body):
+        self.parts = [""]  # literal text around leaves, one more than leaves
+        self.leaves = []
+        self.add(json_body)
+
+    def literal(self, text: str) -> ():
+        self.parts[-1] += text
+
+    def add(self, body) -> ():
+        if isinstance(body, dict):
+            self.literal("{")
+            for i, (k, v) in enumerate(body.items()):
+                self.literal(f"{', ' if i > 0 else ''}{json.dumps(k)}: ")
+                self.add(v)
+            self.literal("}")
+        elif isinstance(body, list):
+            self.literal("[")
+            for i, item in enumerate(body):
+                self.literal(", " if i > 0 else "")
+                self.add(item)
+            self.literal("]")
+        elif isinstance(body, (str, bool, int, float)):
+            self.leaves.append(bool if isinstance(body, bool) else type(body))
+            self.parts.append("")
+        else:
+            self.literal(json.dumps(body))
+
+    def render(self, rand=lambda: rstr.rstr(string.printable), rng: random.Random = random) -> str:
+        ret = [self.parts[0]]
+        for kind, part in zip(self.leaves, self.parts[1:]):
+            ret.append(fuzz_leaf(kind, rand, rng))
+            ret.append(part)
+        return ''.join(ret)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_json(text: str) -> JsonTemplate:
+    return JsonTemplate(json.loads(text))
+
+
+def payload_source(request: model.HTTPRequest):
+    # only what generation needs, so it's cheap to send to worker processes
+    match request.body_type:
+        case model.RequestBodyType.FORM_DATA:
+            return len(list(filter(lambda elem: elem.enabled, request.body.elements)))
+        case model.RequestBodyType.JSON:
+            return compile_json(request.body)
+    return None
+
+
+def make_payload(body_type: model.RequestBodyType, source, seed: int = None):
+    # the same seed always gives the same payload
+    rng, rand = seeded(seed)
+    match body_type:
+        case model.RequestBodyType.FORM_DATA:  # values for enabled elements
+            return [rand() for i in range(source)]
+        case model.RequestBodyType.RAW:
+            return rand()
+        case model.RequestBodyType.JSON:
+            return source.render(rand, rng)
+
+
+def generate_payloads(body_type: model.RequestBodyType, source, seeds: list[int]) -> (list, float):
+    # runs in worker processes, returns (seed, payload) pairs and CPU time it took
+    start = time.process_time()
+    payloads = [(seed, make_payload(body_type, source, seed)) for seed in seeds]
+    return payloads, time.process_time() - start
+
+
+def apply_payload(request: model.HTTPRequest, payload) -> ():
+    match request.body_type:
+        case model.RequestBodyType.FORM_DATA:
+            for elem, value in zip(filter(lambda elem: elem.enabled, request.body.elements), payload):
+                elem.value = value
+        case model.RequestBodyType.RAW | model.RequestBodyType.JSON:
+            request.body = payload
+
+
+class PayloadStream:
+    def __init__(self, request: model.HTTPRequest, count: int, seed: int, position: int):
+        self.body_type = request.body_type
+        self.source = payload_source(request)
+        self.seed = seed
+        self.position = position
+        self.next = 0  # index of the next request given a seed
+        self.remaining = count  # payloads not given to generation yet
+        self.in_flight = 0  # batches being generated
+        self.batches = deque()  # generated batches
+        self.current = deque()
+
+    def seeds(self, count: int) -> list[int]:
+        ret = [request_seed(self.seed, self.position, model.TestType.FUZZ, self.next + i) for i in range(count)]
+        self.next += count
+        return ret
+
+
+class PayloadGenerator:
+    # generates fuzz payloads in batches ahead of the request workers, optionally in worker
+    # processes so generation doesn't compete with network threads for the GIL.
+    # at most max_batches per endpoint wait to be sent, workers only block if generation falls behind.
+    # payloads come from per request seeds (request_seed) so they don't depend on batching
+    def __init__(self, processes: int = 0, batch_size: int = 64, max_batches: int = 4, seed: int = 0):
+        self.processes = processes
+        self.seed = seed
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, max_batches)
+        self.executor = None
+        self.thread = None
+
+        self.streams = {}
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.generated = 0
+        self.seconds = 0.0  # CPU time spent generating
+
+    def add(self, endpoint: model.Endpoint, count: int, position: int = 0) -> ():
+        try:
+            self.streams[id(endpoint)] = PayloadStream(endpoint.interaction.request, count, self.seed, position)
+        except Exception:  # like invalid json body, reported by each request instead
+            pass
+
+    def start(self) -> ():
+        if self.streams == {}:
+            return
+
+        if self.processes > 0:
+            self.executor = futures.ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        self.thread = threading.Thread(target=self.feed, name="payload-generator", daemon=True)
+        self.thread.start()
+
+    def jobs(self) -> list[(PayloadStream, list[int])]:
+        ret = []
+        for stream in self.streams.values():
+            while stream.remaining > 0 and len(stream.batches) + stream.in_flight < self.max_batches:
+                count = min(self.batch_size, stream.remaining)
+                stream.remaining -= count
+                stream.in_flight += 1
+                ret.append((stream, stream.seeds(count)))
+        return ret
+
+    def feed(self) -> ():
+        pending = {}
+        while True:
+            with self.cond:
+                if self.closed:
+                    return
+                jobs = self.jobs()
+                if jobs == [] and pending == {}:
+                    if all(map(lambda s: s.remaining == 0, self.streams.values())):
+                        return
+                    self.cond.wait()  # until workers take a batch
+                    continue
+
+            for stream, seeds in jobs:
+                if self.executor is None:
+                    self.finish(stream, lambda: generate_payloads(stream.body_type, stream.source, seeds))
+                    continue
+                try:
+                    pending[self.executor.submit(generate_payloads, stream.body_type, stream.source, seeds)] = stream
+                except RuntimeError:  # shut down by close
+                    return
+
+            if pending != {}:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    self.finish(pending.pop(future), future.result)
+
+    def finish(self, stream: PayloadStream, result) -> ():
+        try:
+            payloads, seconds = result()
+        except Exception as e:
+            # workers fall back to generating themselves and report the error per request
+            log(LogLevel.error, f"Failed generating fuzz payloads: {str(e)}")
+            payloads, seconds = [], 0
+            stream.remaining = 0
+
+        with self.cond:
+            stream.in_flight -= 1
+            stream.batches.append(payloads)
+            self.generated += len(payloads)
+            self.seconds += seconds
+            self.cond.notify_all()
+
+    def get(self, endpoint: model.Endpoint, block: bool = True):
+        # next (seed, payload), payload is None if caller should generate it from the seed itself,
+        # also when generation is behind and caller can't block (event loop). None for endpoints that weren't added
+        stream = self.streams.get(id(endpoint))
+        if stream is None:
+            return None
+
+        with self.cond:
+            while len(stream.current) == 0:
+                if len(stream.batches) > 0:
+                    stream.current = deque(stream.batches.popleft())
+                    self.cond.notify_all()
+                elif not block or self.closed or (stream.remaining == 0 and stream.in_flight == 0):
+                    return stream.seeds(1)[0], None
+                else:
+                    self.cond.wait()
+            return stream.current.popleft()
+
+    def throughput(self) -> float:  # payloads per second of generation CPU time
+        if self.seconds <= 0:
+            return None
+        return self.generated / self.seconds
+
+    def close(self) -> ():
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+
+from . import model
+from .result_store import ResultStore, connect_read_only
+from .serialization import (dynamic_options_to_json, dynamic_options_from_json, endpoint_from_json,
+                            run_options_to_json, run_options_from_json)
+
+# project files are sqlite databases: endpoints and options load right away, results are
+# read from the same file in the background. files of earlier versions were a
+# pickle of the whole model and are still opened, saving converts them
+FORMAT = "web-tester"
+VERSION = 1
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS options (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# MIGRATIONS[i] takes a connection to a file of version i + 1 to version i + 2
+MIGRATIONS = []
+
+
+class ProjectError(Exception):
+    pass
+
+
+def is_legacy(filename: str) -> bool:
+    with open(filename, "rb") as file:
+        return file.read(len(SQLITE_HEADER)) != SQLITE_HEADER
+
+
+def version(connection: sqlite3.Connection) -> int:
+    try:
+        meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+    except sqlite3.OperationalError:  # no meta table
+        meta = {}
+    if meta.get("format") != FORMAT:
+        raise ProjectError("not a web tester project")
+    try:
+        return int(meta["version"])
+    except (KeyError, ValueError):
+        raise ProjectError("project has no valid format version")
+
+
+def check_version(current: int) -> ():
+    if current > VERSION:
+        raise ProjectError(f"project was saved by a newer version (format {current}, supported up to {VERSION})")
+
+
+def migrate(connection: sqlite3.Connection) -> ():
+    current = version(connection)
+    check_version(current)
+
+    for migration in MIGRATIONS[current - 1:]:
+        migration(connection)
+        current += 1
+        connection.execute("UPDATE meta SET value = ? WHERE key = 'version'", (str(current),))
+    connection.commit()
+
+
+def save_project(project: model.Model, filename: str) -> ():
+    # written next to the file and moved over it, a failed save leaves the old file as it was
+    temporary = filename + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    database = ResultStore(temporary)
+    try:
+        with database.lock:
+            connection = database.connection
+            connection.executescript(SCHEMA)
+            connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [("format", FORMAT), ("version", str(VERSION))])
+            connection.executemany("INSERT INTO options (key, data) VALUES (?, ?)", [
+                ("dynamic_options", json.dumps(dynamic_options_to_json(project.dynamic_options))),
+                ("run_options", json.dumps(run_options_to_json(project.run_options))),
+            ])
+            for position, endpoint in enumerate(project.endpoints):
+                database.endpoint_id(endpoint, position)
+        database.extend(project.results)
+        database.connection.execute("PRAGMA journal_mode=DELETE")  # single file to move around
+    finally:
+        database.close()
+    os.replace(temporary, filename)
+
+
+def load_project(filename: str) -> model.Model:
+    # results stay on disk, load_results reads them into the model's log
+    if is_legacy(filename):
+        return model.Model.load_pickle(filename)
+
+    # format is checked before anything could write to the file, only older versions are written to
+    connection = connect_read_only(filename)
+    try:
+        current = version(connection)
+    finally:
+        connection.close()
+    check_version(current)
+    if current < VERSION:
+        connection = sqlite3.connect(filename)
+        try:
+            migrate(connection)
+        finally:
+            connection.close()
+
+    database = ResultStore(filename, read_only=True)
+    try:
+        with database.lock:
+            connection = database.connection
+            options = dict(connection.execute("SELECT key, data FROM options").fetchall())
+            endpoints = []
+            for row, data in connection.execute("SELECT id, data FROM endpoints WHERE position IS NOT NULL ORDER BY position").fetchall():
+                endpoint = endpoint_from_json(json.loads(data))
+                database.add_endpoint(row, endpoint)  # loaded results point to these
+                endpoints.append(endpoint)
+    except Exception:
+        database.close()
+        raise
+
+    ret = model.Model(endpoints, [], dynamic_options_from_json(json.loads(options.get("dynamic_options", "null"))),
+                      run_options_from_json(json.loads(options.get("run_options", "{}"))))
+    ret.results = model.ResultLog(database=database)
+    return ret
+
+
+def load_results(project: model.Model, stop=lambda: False):
+    # reads results of an opened project into its log, yields each so callers can follow along
+    results = project.results
+    if results.database is None:
+        return
+    for result in results.database.results(project.endpoints):
+        if stop():
+            return
+        results.add_loaded(result)
+        yield result
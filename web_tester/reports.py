@@ -1,7 +1,7 @@
 from . import model
-from docx import Document
-# from docx.shared import Cm
+from .metrics import RunMetrics
 from typing import List
+import json
 
 
 def format_float(num: float) -> str:
@@ -12,7 +12,14 @@ def format_float(num: float) -> str:
     return f"{round(num)}s"
         
 
-def export_test_results(filename: str, results: List[model.TestResult]):
+def format_optional(num: float) -> str:
+    return "-" if num is None else format_float(num)
+
+
+def export_test_results(filename: str, results: List[model.TestResult], metrics: RunMetrics = None):
+    from docx import Document  # python-docx is slow to import and only needed here
+    # from docx.shared import Cm
+
     document = Document()
 
     document.add_heading('Testing Report', 0)
@@ -37,10 +44,53 @@ def export_test_results(filename: str, results: List[model.TestResult]):
         row_cells[1].text = result.severity.name
         result_count[result.severity] += 1
         row_cells[2].text = result.verdict
+        if result.elapsed_time is None:  # request failed
+            row_cells[3].text = "-"
+            continue
         elapsed_seconds = result.elapsed_time.total_seconds()
         row_cells[3].text = format_float(elapsed_seconds)
         total_time += elapsed_seconds
     document.add_paragraph(f"Total response time for tests: {format_float(total_time)}")
     document.add_paragraph(f"Result count (Ok/Warning/Danger/Critical): {result_count[model.Severity.OK]}/{result_count[model.Severity.WARNING]}/{result_count[model.Severity.DANGER]}/{result_count[model.Severity.CRITICAL]}")
 
+    if metrics is None:
+        metrics = RunMetrics.from_results(results)
+
+    document.add_heading('Latency', 1)
+    table = document.add_table(rows=1, cols=8)
+    for cell, name in zip(table.rows[0].cells, ['Endpoint', 'Requests', 'Errors', 'p50', 'p90', 'p99', 'Max', 'Requests/s']):
+        cell.text = name
+
+    for stats in metrics.stats():
+        row_cells = table.add_row().cells
+        row_cells[0].text = stats.name
+        row_cells[1].text = str(stats.count)
+        row_cells[2].text = str(stats.errors)
+        row_cells[3].text = format_optional(stats.p50)
+        row_cells[4].text = format_optional(stats.p90)
+        row_cells[5].text = format_optional(stats.p99)
+        row_cells[6].text = format_optional(stats.max)
+        row_cells[7].text = "-" if stats.throughput is None else f"{stats.throughput:.1f}"  # none for loaded results
+
     document.save(filename)
+
+
+def result_to_dict(result: model.TestResult) -> dict:
+    return {
+        "url": result.endpoint.url,
+        "http_type": result.endpoint.http_type(),
+        "test_type": None if result.test_type is None else str(result.test_type),
+        "severity": result.severity.name,
+        "verdict": result.verdict,
+        "elapsed": None if result.elapsed_time is None else result.elapsed_time.total_seconds(),
+        "status": None if result.response is None else result.response.http_status.value,
+        "error": None if result.error is None else str(result.error),
+        "seed": result.seed,
+        "run": result.run,
+        "user": result.user,
+    }
+
+
+def export_json(filename: str, results: List[model.TestResult], summary: dict = {}):
+    with open(filename, "w") as output:
+        json.dump({"summary": summary, "results": list(map(result_to_dict, results))}, output, indent=4)
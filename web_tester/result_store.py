@@ -0,0 +1,151 @@
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+
+from . import model
+from .serialization import endpoint_to_json, endpoint_from_json, result_to_json, result_from_json
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS endpoints (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    http_type TEXT NOT NULL,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    endpoint INTEGER NOT NULL REFERENCES endpoints(id),
+    http_type TEXT NOT NULL,
+    test_type TEXT,
+    severity INTEGER NOT NULL,
+    verdict TEXT NOT NULL,
+    elapsed REAL,
+    status INTEGER,
+    body INTEGER REFERENCES bodies(id),
+    data TEXT NOT NULL
+);
+"""
+
+
+def connect_read_only(filename: str) -> sqlite3.Connection:
+    return sqlite3.connect(pathlib.Path(filename).absolute().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+
+
+class ResultStore:
+    # results written to sqlite as they arrive. WAL keeps appends cheap and lets exports read while
+    # workers write, every result is committed so a crash only loses the ones in flight.
+    # the gui filters the in-memory ResultLog, the database is only read in id order so results has no indexes
+    # project files (project.py) are the same database with a few more tables, opened read_only
+    # so reading one doesn't change the file
+    def __init__(self, filename: str, clear: bool = False, read_only: bool = False) -> ():
+        self.filename = filename
+        if read_only:
+            self.connection = connect_read_only(filename)
+        else:
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+        if clear:
+            self.connection.executescript("DELETE FROM results; DELETE FROM bodies; DELETE FROM endpoints;")
+        self.lock = threading.Lock()
+
+        self.endpoint_ids = {}  # id(endpoint) -> row, endpoints are kept so ids stay valid
+        self.endpoints = {}  # row -> endpoint
+        self.body_ids = {}  # body -> row
+
+    def endpoint_id(self, endpoint: model.Endpoint, position: int = None) -> int:
+        if id(endpoint) not in self.endpoint_ids:
+            cursor = self.connection.execute("INSERT INTO endpoints (url, http_type, position, data) VALUES (?, ?, ?, ?)",
+                                             (endpoint.url, endpoint.http_type(), position, json.dumps(endpoint_to_json(endpoint))))
+            self.add_endpoint(cursor.lastrowid, endpoint)
+        return self.endpoint_ids[id(endpoint)]
+
+    def add_endpoint(self, row: int, endpoint: model.Endpoint) -> ():
+        self.endpoint_ids[id(endpoint)] = row
+        self.endpoints[row] = endpoint
+
+    def body_id(self, body: str) -> int:
+        # keyed by the text first, results share body objects (model.ContentStore) so that's mostly an identity check
+        if body not in self.body_ids:
+            key = hashlib.blake2b(body.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+            self.connection.execute("INSERT OR IGNORE INTO bodies (hash, body) VALUES (?, ?)", (key, body))
+            self.body_ids[body] = self.connection.execute("SELECT id FROM bodies WHERE hash = ?", (key,)).fetchone()[0]
+        return self.body_ids[body]
+
+    def insert(self, result: model.TestResult) -> int:
+        body = None
+        if result.response is not None and isinstance(result.response.body, str):
+            body = self.body_id(result.response.body)
+
+        cursor = self.connection.execute(
+            "INSERT INTO results (endpoint, http_type, test_type, severity, verdict, elapsed, status, body, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.endpoint_id(result.endpoint), result.endpoint.http_type(),
+             None if result.test_type is None else str(result.test_type), result.severity.value, result.verdict,
+             None if result.elapsed_time is None else result.elapsed_time.total_seconds(),
+             None if result.response is None else result.response.http_status.value, body, json.dumps(result_to_json(result))))
+        return cursor.lastrowid
+
+    def append(self, result: model.TestResult) -> int:  # row id
+        with self.lock:
+            row = self.insert(result)
+            self.connection.commit()
+            return row
+
+    def extend(self, results) -> list[int]:  # one transaction for all, for saving
+        with self.lock:
+            rows = list(map(self.insert, results))
+            self.connection.commit()
+            return rows
+
+    def resolve_endpoint(self, row: int, endpoints: list[model.Endpoint]) -> model.Endpoint:
+        if row not in self.endpoints:
+            url, http_type, data = self.connection.execute("SELECT url, http_type, data FROM endpoints WHERE id = ?", (row,)).fetchone()
+            # results of an earlier session point to the project's endpoints when they're still there
+            same = [e for e in endpoints if e.url == url and e.http_type() == http_type]
+            self.endpoints[row] = same[0] if same != [] else endpoint_from_json(json.loads(data))
+        return self.endpoints[row]
+
+    def load(self, endpoints: list[model.Endpoint] = [], batch: int = 500):
+        # (row id, result) read from disk in batches, for exporting and reopening after a crash
+        after = 0
+        bodies = {None: None}  # each body is read once and shared by its results
+        while True:
+            with self.lock:
+                rows = self.connection.execute("SELECT id, endpoint, severity, verdict, elapsed, body, data FROM results "
+                                               "WHERE id > ? ORDER BY id LIMIT ?", (after, batch)).fetchall()
+                for row in rows:
+                    if row[5] not in bodies:
+                        bodies[row[5]] = self.connection.execute("SELECT body FROM bodies WHERE id = ?", (row[5],)).fetchone()[0]
+                rows = [(row[0], self.resolve_endpoint(row[1], endpoints)) + row[2:5] + (bodies[row[5]], row[6]) for row in rows]
+            if rows == []:
+                return
+
+            for row, endpoint, severity, verdict, elapsed, body, data in rows:
+                yield row, result_from_json(json.loads(data), endpoint, severity, verdict, elapsed, body)
+            after = rows[-1][0]
+
+    def results(self, endpoints: list[model.Endpoint] = []):
+        return map(lambda loaded: loaded[1], self.load(endpoints))
+
+    def close(self) -> ():
+        with self.lock:
+            self.connection.close()
+
+
+def open_results(filename: str, endpoints: list[model.Endpoint] = []) -> model.ResultLog:
+    # results of an earlier run, new runs replace them
+    database = ResultStore(filename)
+    ret = model.ResultLog(database=database)
+    for result in database.results(endpoints):
+        ret.add_loaded(result)
+    return ret
@@ -0,0 +1,239 @@
+from typing import Callable
+from collections import deque
+from concurrent import futures
+
+import queue
+import threading
+import time
+
+from . import model
+from .sessions import host_key
+
+
+class TokenBucket:
+    # not thread safe, only used from the thread (or event loop) that dispatches requests
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+
+    def try_acquire(self) -> float:  # 0 if token was taken, otherwise seconds until next token
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class HostLimiter:
+    def __init__(self, limit: model.RateLimit = None):
+        self.limit = limit
+        self.bucket = None
+        self.max_in_flight = 0
+        if limit is not None:
+            if limit.requests_per_second > 0:
+                self.bucket = TokenBucket(limit.requests_per_second, limit.burst)
+            self.max_in_flight = limit.max_in_flight
+
+        self.in_flight = 0
+        self.jobs = deque()
+        self.lock = threading.Lock()  # for wait, start and finish, the scheduler only uses it from one thread
+        self.slots = threading.Condition(self.lock)
+
+    def can_start(self) -> bool:
+        return self.max_in_flight <= 0 or self.in_flight < self.max_in_flight
+
+    def acquire(self) -> float:
+        if self.bucket is None:
+            return 0
+        return self.bucket.try_acquire()
+
+    def wait(self) -> ():  # for runs without a scheduler, virtual users of dynamic runs share it
+        while True:
+            with self.lock:
+                delay = self.acquire()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def start(self) -> ():
+        # like wait, but also takes one of max_in_flight slots. every start needs a finish
+        with self.slots:
+            self.slots.wait_for(self.can_start)
+            self.in_flight += 1
+        self.wait()
+
+    def finish(self) -> ():
+        with self.slots:
+            self.in_flight -= 1
+            self.slots.notify()
+
+
+def host_limits(endpoints: list[model.Endpoint], default: model.RateLimit = None) -> dict[(str, str, int), model.RateLimit]:
+    # limits are per host, when endpoints of one host disagree the strictest one wins
+    ret = {}
+    for endpoint in endpoints:
+        limit = endpoint.rate_limit if endpoint.rate_limit is not None else default
+        if limit is None:
+            continue
+
+        key = host_key(endpoint.url)
+        ret[key] = limit if key not in ret else model.RateLimit.strictest(ret[key], limit)
+    return ret
+
+
+class Scheduler:
+    # feeds the executor per host so a throttled host doesn't hold back the others
+    def __init__(self, executor: futures.Executor, limits: dict[(str, str, int), model.RateLimit] = {}, max_pending: int = None,
+                 concurrency=None):
+        self.executor = executor
+        self.limits = limits
+        self.max_pending = max_pending if max_pending is not None else executor._max_workers
+        self.concurrency = concurrency  # AdaptiveLimit, lowers max_pending while target struggles
+        self.hosts = {}
+        self.completed = queue.Queue()
+        self.pending = 0
+        self.cancelled = False
+
+    def limiter(self, url: str) -> HostLimiter:
+        key = host_key(url)
+        if key not in self.hosts:
+            self.hosts[key] = HostLimiter(self.limits.get(key))
+        return self.hosts[key]
+
+    def add(self, url: str, fn: Callable, *args) -> ():
+        self.limiter(url).jobs.append((fn, args))
+
+    def queued(self) -> int:
+        return sum(map(lambda h: len(h.jobs), self.hosts.values()))
+
+    def dispatch(self) -> float:  # returns seconds until some throttled host can send again, None if nothing waits
+        wait = None
+        max_pending = self.max_pending
+        if self.concurrency is not None:
+            max_pending = min(max_pending, self.concurrency.current())
+
+        ready = list(self.hosts.values())
+        while ready and self.pending < max_pending and not self.cancelled:
+            # one job per host each pass so hosts get a fair share of the executor
+            for host in list(ready):
+                if not host.jobs or not host.can_start():
+                    ready.remove(host)
+                    continue
+
+                delay = host.acquire()
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    ready.remove(host)
+                    continue
+
+                try:
+                    fn, args = host.jobs.popleft()
+                except IndexError:  # cleared by cancel
+                    return None
+
+                try:
+                    future = self.executor.submit(fn, *args)
+                except RuntimeError:  # executor was shut down
+                    self.cancelled = True
+                    return None
+
+                host.in_flight += 1
+                self.pending += 1
+                future.add_done_callback(lambda f, host=host: self.completed.put((host, f)))
+
+                if self.pending >= max_pending:
+                    break
+        return wait
+
+    def run(self):  # yields futures as they complete
+        while True:
+            wait = self.dispatch()
+            if self.pending == 0:
+                if self.cancelled or wait is None:
+                    return
+                time.sleep(wait)
+                continue
+
+            try:
+                host, future = self.completed.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+            host.in_flight -= 1
+            self.pending -= 1
+            yield future
+
+    def cancel(self) -> ():
+        self.cancelled = True
+        for host in self.hosts.values():
+            host.jobs.clear()
+
+
+class AdaptiveLimit:
+    # AIMD on requests in flight: grows by about one per window of results while latency
+    # stays close to the best seen, halves on timeouts/connection errors or latency spikes
+    def __init__(self, maximum: int, minimum: int = 1, initial: int = 4, backoff: float = 0.5, tolerance: float = 2.0,
+                 history: int = 300):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.backoff = backoff
+        self.tolerance = tolerance
+
+        self.smoothed = None  # latency moving average
+        self.baseline = None  # best smoothed latency, slowly forgotten
+        self.cooldown = 0  # results to skip before backing off again
+
+        self.start = time.monotonic()
+        self.history = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.record()
+
+    def current(self) -> int:
+        return int(self.limit)
+
+    def record(self) -> ():
+        with self.lock:
+            self.history.append((time.monotonic() - self.start, self.current()))
+
+    def samples(self) -> list[(float, int)]:
+        with self.lock:
+            return list(self.history)
+
+    def timeline(self, count: int = 100) -> list[int]:  # limit at evenly spaced moments since start
+        samples = self.samples()
+        end = time.monotonic() - self.start
+
+        ret = []
+        i = 0
+        for step in range(count):
+            moment = end * step / max(1, count - 1)
+            while i + 1 < len(samples) and samples[i + 1][0] <= moment:
+                i += 1
+            ret.append(samples[i][1])
+        return ret
+
+    def on_result(self, latency: float, failed: bool) -> ():
+        previous = self.current()
+        self.cooldown = max(0, self.cooldown - 1)
+
+        congested = failed
+        if latency is not None and not failed:
+            self.smoothed = latency if self.smoothed is None else 0.9 * self.smoothed + 0.1 * latency
+            self.baseline = self.smoothed if self.baseline is None else min(self.baseline * 1.001, self.smoothed)
+            congested = self.smoothed > self.tolerance * self.baseline
+
+        if congested:
+            if self.cooldown == 0:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self.cooldown = max(1, previous)  # one window of requests sent with the old limit
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+        if self.current() != previous:
+            self.record()
@@ -0,0 +1,159 @@
+from http import HTTPStatus
+
+import datetime
+import hashlib
+import json
+
+from . import model
+
+# plain json friendly data instead of pickles, so files don't depend on class layouts.
+# constructors fill in fields missing from older files, received data is restored without
+# them since they would reformat bodies
+
+
+def restore(cls, **attributes):
+    ret = cls.__new__(cls)
+    for k, v in attributes.items():
+        setattr(ret, k, v)
+    return ret
+
+
+def dictionary_to_json(dictionary: model.PartialDictionary) -> list:
+    return [[e.key, e.value, e.enabled] for e in dictionary.elements]
+
+
+def dictionary_from_json(data: list) -> model.PartialDictionary:
+    return restore(model.PartialDictionary, elements=[model.PartialDictionary.Element(k, v, enabled) for k, v, enabled in data])
+
+
+def request_to_json(request: model.HTTPRequest) -> dict:
+    body = request.body
+    if isinstance(body, model.PartialDictionary):
+        body = dictionary_to_json(body)
+    return {"http_type": str(request.http_type), "body_type": str(request.body_type), "body": body,
+            "headers": dictionary_to_json(request.headers), "cookies": dictionary_to_json(request.cookies)}
+
+
+def request_from_json(data: dict) -> model.HTTPRequest:
+    body = data["body"]
+    if isinstance(body, list):
+        body = dictionary_from_json(body)
+    return restore(model.HTTPRequest, http_type=model.HTTPType(data["http_type"]), body_type=model.RequestBodyType(data["body_type"]),
+                   body=body, headers=dictionary_from_json(data["headers"]), cookies=dictionary_from_json(data["cookies"]))
+
+
+def response_to_json(response: model.HTTPResponse, body: bool = True) -> dict:  # without body if it's stored elsewhere
+    ret = {"http_status": response.http_status.value, "body_type": str(response.body_type),
+           "headers": dictionary_to_json(response.headers), "cookies": dictionary_to_json(response.cookies),
+           "length": response.length, "truncated": response.truncated}
+    if body:
+        ret["body"] = response.body
+    return ret
+
+
+def response_from_json(data: dict, body: str = None) -> model.HTTPResponse:
+    return model.HTTPResponse(HTTPStatus(data["http_status"]), model.ResponseBodyType(data["body_type"]),
+                              data.get("body", body), dictionary_from_json(data["headers"]), dictionary_from_json(data["cookies"]),
+                              data.get("length"), data.get("truncated", False))
+
+
+def rate_limit_to_json(rate_limit: model.RateLimit) -> dict:
+    return None if rate_limit is None else dict(vars(rate_limit))
+
+
+def rate_limit_from_json(data: dict) -> model.RateLimit:
+    return None if data is None else model.RateLimit(**data)
+
+
+def endpoint_to_json(endpoint: model.Endpoint) -> dict:
+    return {
+        "url": endpoint.url,
+        "enabled": endpoint.enabled,
+        "request": request_to_json(endpoint.interaction.request),
+        "response": response_to_json(endpoint.interaction.response),
+        "max_wait_time": endpoint.max_wait_time,
+        "match_test": endpoint.match_test,
+        "fuzz_test": None if endpoint.fuzz_test is None else {"count": endpoint.fuzz_test.count},
+        "sqlinj_test": None if endpoint.sqlinj_test is None else {"count": endpoint.sqlinj_test.count,
+                                                                  "wordlist": endpoint.sqlinj_test.wordlist.filename},
+        "rate_limit": rate_limit_to_json(endpoint.rate_limit),
+        "max_body_size": endpoint.max_body_size,
+    }
+
+
+def endpoint_from_json(data: dict) -> model.Endpoint:
+    interaction = model.Interaction(request_from_json(data["request"]), response_from_json(data["response"]))
+    ret = model.Endpoint(data["url"], interaction, fuzz_test=None)
+    ret.enabled = data.get("enabled", ret.enabled)
+    ret.max_wait_time = data.get("max_wait_time", ret.max_wait_time)
+    ret.match_test = data.get("match_test", ret.match_test)
+    if (fuzz_test := data.get("fuzz_test")) is not None:
+        ret.fuzz_test = model.FuzzTest(fuzz_test["count"])
+    if (sqlinj_test := data.get("sqlinj_test")) is not None:
+        ret.sqlinj_test = model.SQLInjectionTest(sqlinj_test["count"], model.Wordlist(sqlinj_test["wordlist"]))
+    ret.rate_limit = rate_limit_from_json(data.get("rate_limit"))
+    ret.max_body_size = data.get("max_body_size", ret.max_body_size)
+    return ret
+
+
+def endpoint_fingerprint(endpoint: model.Endpoint) -> str:
+    # changes with anything that affects results: request, expected response and test options
+    data = endpoint_to_json(endpoint)
+    for k in ["enabled", "rate_limit"]:
+        del data[k]
+    return hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def dynamic_options_to_json(options: model.DynamicTestingOptions) -> dict:
+    if options is None:
+        return None
+    return {"use_initial_values": options.use_initial_values, "initial_cookies": dictionary_to_json(options.initial_cookies),
+            "virtual_users": options.virtual_users}
+
+
+def dynamic_options_from_json(data: dict) -> model.DynamicTestingOptions:
+    if data is None:
+        return None
+    return model.DynamicTestingOptions(data["use_initial_values"], dictionary_from_json(data["initial_cookies"]),
+                                        model.clamp_virtual_users(data.get("virtual_users", 1)))
+
+
+def run_options_to_json(options: model.RunOptions) -> dict:
+    ret = dict(vars(options))
+    ret["engine"] = str(options.engine)
+    ret["rate_limit"] = rate_limit_to_json(options.rate_limit)
+    return ret
+
+
+def run_options_from_json(data: dict) -> model.RunOptions:
+    ret = model.RunOptions.default()
+    for k, v in data.items():
+        if hasattr(ret, k):  # options of newer versions are dropped
+            setattr(ret, k, v)
+    ret.engine = model.Engine(ret.engine)
+    ret.rate_limit = rate_limit_from_json(data.get("rate_limit"))
+    return ret
+
+
+def result_to_json(result: model.TestResult) -> dict:
+    # what has no column in the result store, endpoint and body are stored once in their own tables
+    return {
+        "test_type": None if result.test_type is None else str(result.test_type),
+        "error": None if result.error is None else str(result.error),
+        "response": None if result.response is None else response_to_json(result.response, False),
+        "diff_request": None if result.diff_request is result.endpoint.interaction.request else request_to_json(result.diff_request),
+        "seed": result.seed,
+        "run": result.run,
+        "fingerprint": result.fingerprint,
+        "user": result.user,
+    }
+
+
+def result_from_json(data: dict, endpoint: model.Endpoint, severity: int, verdict: str, elapsed: float, body: str) -> model.TestResult:
+    # errors come back as their text, the exception objects aren't kept
+    return model.TestResult(
+        endpoint, model.Severity(severity), verdict, None if elapsed is None else datetime.timedelta(seconds=elapsed),
+        None if data["diff_request"] is None else request_from_json(data["diff_request"]),
+        None if data["response"] is None else response_from_json(data["response"], body),
+        data["error"], None if data["test_type"] is None else model.TestType(data["test_type"]), data.get("seed"),
+        data.get("run"), data.get("fingerprint"), data.get("user"))
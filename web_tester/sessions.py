@@ -0,0 +1,103 @@
+from urllib.parse import urlsplit
+from http.cookiejar import DefaultCookiePolicy
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def host_key(url: str) -> (str, str, int):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port
+    if port is None:
+        port = 443 if scheme == "https" else 80
+    return (scheme, (parts.hostname or "").lower(), port)
+
+
+class ConnectionStats:
+    def __init__(self, requests: int = 0, connections: int = 0):
+        self.requests = requests
+        self.connections = connections
+
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+    def reuse_ratio(self) -> float:
+        if self.requests == 0:
+            return 0
+        return self.reused() / self.requests
+
+    def __add__(self, other):  # -> ConnectionStats:
+        return ConnectionStats(self.requests + other.requests, self.connections + other.connections)
+
+    def __sub__(self, other):  # -> ConnectionStats:
+        return ConnectionStats(self.requests - other.requests, self.connections - other.connections)
+
+    def __str__(self) -> str:
+        return f"{self.requests} requests over {self.connections} connections ({self.reused()} reused, {round(self.reuse_ratio() * 100)}%)"
+
+
+class SessionPool:
+    # one keep-alive session per (scheme, host, port) shared by all test threads
+    def __init__(self, pool_size: int = 10):
+        self.pool_size = pool_size
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def make_session(self) -> requests.Session:
+        session = requests.Session()
+        # cookies are set per request by the tests, session must not carry them between requests
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, url: str) -> requests.Session:
+        key = host_key(url)
+        with self.lock:
+            if key not in self.sessions:
+                self.sessions[key] = self.make_session()
+            return self.sessions[key]
+
+    def grow(self, pool_size: int) -> ():
+        # only grows, open connections and their counters stay. sessions of new hosts are made with the
+        # new size, the one pool of each existing session gets the extra empty slots urllib3 would have made.
+        # the pool manager's settings stay as they are, they're part of the key its pool is found by
+        with self.lock:
+            if pool_size <= self.pool_size:
+                return
+            added = pool_size - self.pool_size
+            self.pool_size = pool_size
+
+            for session in self.sessions.values():
+                pools = session.get_adapter("http://").poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None or pool.pool is None:  # closed
+                        continue
+                    with pool.pool.mutex:
+                        pool.pool.maxsize += added
+                    for _ in range(added):
+                        pool.pool.put(None)
+
+    def stats(self) -> ConnectionStats:
+        ret = ConnectionStats()
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        for session in sessions:
+            pools = session.get_adapter("http://").poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    ret += ConnectionStats(pool.num_requests, pool.num_connections)
+        return ret
+
+    def close(self) -> ():
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
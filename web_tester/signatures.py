@@ -0,0 +1,96 @@
+import re
+import threading
+
+
+class SignatureMatch:
+    def __init__(self, signature: str, start: int, end: int) -> ():
+        self.signature = signature
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"SignatureMatch({self.signature!r}, {self.start}, {self.end})"
+
+
+def make_match(match: re.Match) -> SignatureMatch:
+    signature = match.group()
+    if isinstance(signature, bytes):
+        signature = signature.decode("utf-8", errors="replace")
+    return SignatureMatch(signature, match.start(), match.end())
+
+
+def trie_pattern(node: dict) -> str:
+    # node maps next character to child node, "" marks end of a signature
+    alternatives = [re.escape(ch) + trie_pattern(child) for ch, child in sorted(node.items()) if ch != ""]
+    if alternatives == []:
+        return ""
+
+    if len(alternatives) == 1 and "" not in node:
+        return alternatives[0]
+
+    ret = f"(?:{'|'.join(alternatives)})"
+    if "" in node:
+        ret += "?"
+    return ret
+
+
+class SignatureMatcher:
+    # signatures are compiled once into a trie shaped regex, this makes the regex engine
+    # walk an automaton instead of trying every alternative at every position.
+    # compiled patterns are immutable so one matcher can be shared between threads
+    cache = {}
+    cache_lock = threading.Lock()
+
+    def __init__(self, signatures: list[str]) -> ():
+        self.signatures = list(dict.fromkeys(filter(lambda s: s != "", map(lambda s: s.strip(), signatures))))
+
+        trie = {}
+        for signature in self.signatures:
+            node = trie
+            for ch in signature:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        if self.signatures == []:
+            self.pattern = re.compile(r"(?!)")  # never matches
+        else:
+            self.pattern = re.compile(f"\\b{trie_pattern(trie)}\\b")
+        # same pattern for raw bodies, only used on ascii bytes where it matches like the str one
+        self.bytes_pattern = re.compile(self.pattern.pattern.encode("utf-8"))
+
+    def prepare(self, text: str | bytes, start: int = 0) -> (re.Pattern, str | bytes, int):
+        # \b in a bytes pattern doesn't know non-ascii letters and positions would be in bytes,
+        # so bytes that aren't all ascii are decoded as utf-8 first. positions are always in characters
+        if not isinstance(text, bytes):
+            return self.pattern, text, start
+        if text.isascii():
+            return self.bytes_pattern, text, start
+        return self.pattern, text.decode("utf-8", errors="replace"), len(text[:start].decode("utf-8", errors="replace"))
+
+    def search(self, text: str | bytes, start: int = 0) -> SignatureMatch:
+        pattern, text, start = self.prepare(text, start)
+        match = pattern.search(text, start)
+        if match is None:
+            return None
+        return make_match(match)
+
+    def find_all(self, text: str | bytes) -> list[SignatureMatch]:
+        pattern, text, _ = self.prepare(text)
+        return list(map(make_match, pattern.finditer(text)))
+
+    def matches(self, text: str | bytes) -> bool:
+        pattern, text, _ = self.prepare(text)
+        return pattern.search(text) is not None
+
+    @classmethod
+    def from_file(cls, filename: str):  # -> SignatureMatcher:
+        with cls.cache_lock:
+            if filename not in cls.cache:
+                with open(filename, "r") as file:
+                    cls.cache[filename] = SignatureMatcher(file.readlines())
+            return cls.cache[filename]
+
+    @classmethod
+    def unload(cls, filename: str) -> ():
+        with cls.cache_lock:
+            cls.cache.pop(filename, None)
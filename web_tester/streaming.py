@@ -0,0 +1,112 @@
+import codecs
+
+import requests
+
+from .signatures import SignatureMatcher, SignatureMatch
+from .decoding import ascii_compatible, declared_charset
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BodyInfo:
+    def __init__(self, length: int, truncated: bool, error: SignatureMatch = None) -> ():
+        self.length = length  # full body length in bytes, None if unknown because reading stopped early
+        self.truncated = truncated
+        self.error = error  # first error signature found while reading
+
+
+class StreamScanner:
+    # runs a matcher over text or bytes that arrive in pieces. the last characters are scanned again with
+    # the next piece so signatures split between chunks are found, and a match touching the end
+    # is only trusted once the next piece shows the word really ended there
+    def __init__(self, matcher: SignatureMatcher) -> ():
+        self.matcher = matcher
+        # in bytes, at least as long as in characters. one extra for word boundary before
+        self.overlap = max(map(lambda s: len(s.encode("utf-8")), matcher.signatures), default=0) + 2
+        self.tail = None
+        self.start = 0  # where tail can start matching, characters before only give context
+        self.offset = 0  # position of tail in the whole text
+        self.match = None
+
+    def to_text(self) -> ():  # only valid while everything fed so far was ascii
+        if isinstance(self.tail, bytes):
+            self.tail = self.tail.decode("ascii")
+
+    def feed(self, text: str | bytes, final: bool = False) -> SignatureMatch:
+        if self.match is not None:
+            return self.match
+
+        buffer = text if self.tail is None else self.tail + text
+        match = self.matcher.search(buffer, self.start)
+        if match is not None and (final or match.end < len(buffer)):
+            self.match = SignatureMatch(match.signature, match.start + self.offset, match.end + self.offset)
+            return self.match
+
+        if len(buffer) > self.overlap:
+            self.offset += len(buffer) - self.overlap
+            self.tail = buffer[-self.overlap:]
+            self.start = 1
+        else:
+            self.tail = buffer
+        return None
+
+
+class BodyReader:
+    # keeps at most `limit` bytes of a body read in chunks and scans them for error signatures.
+    # chunks are scanned as raw bytes while they're ascii and the charset encodes ascii as itself,
+    # from the first other byte on they're decoded so word boundaries and positions match the text
+    def __init__(self, limit: int, charset: str, matcher: SignatureMatcher, length: int = None) -> ():
+        self.limit = limit
+        self.length = length  # from Content-Length if known
+        self.charset = charset or "utf-8"
+        self.decoder = None
+        if not ascii_compatible(charset):
+            self.decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        self.scanner = StreamScanner(matcher)
+        self.chunks = []
+        self.read = 0
+        self.truncated = False
+
+    def feed(self, chunk: bytes) -> bool:  # True once the limit was reached and reading should stop
+        if self.read + len(chunk) > self.limit:
+            chunk = chunk[:self.limit - self.read]
+            self.truncated = True
+
+        self.chunks.append(chunk)
+        self.read += len(chunk)
+        if self.decoder is None and not chunk.isascii():
+            self.decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+            self.scanner.to_text()  # bytes so far were ascii, so they're the same characters
+        self.scanner.feed(chunk if self.decoder is None else self.decoder.decode(chunk))
+        return self.truncated
+
+    def finish(self) -> (bytes, BodyInfo):
+        error = self.scanner.feed(b"" if self.decoder is None else self.decoder.decode(b"", final=True), final=True)
+        length = self.length if self.truncated else self.read
+        return b''.join(self.chunks), BodyInfo(length, self.truncated, error)
+
+
+def content_length(headers) -> int:
+    # only usable when the body isn't compressed, otherwise it's the compressed size
+    if "Content-Encoding" in headers:
+        return None
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def read_limited(response: requests.Response, limit: int, matcher: SignatureMatcher) -> ():
+    # for responses requested with stream=True, reading stops at limit and the connection is
+    # dropped instead of downloading the rest
+    reader = BodyReader(limit, declared_charset(response.headers.get("Content-Type")), matcher,
+                        content_length(response.headers))
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if reader.feed(chunk):
+                break
+    finally:
+        response.close()  # gives connection back to the pool, or drops it if body wasn't read to the end
+
+    response._content, response.body_info = reader.finish()
+    response._content_consumed = True
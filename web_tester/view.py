@@ -1,7 +1,10 @@
 import copy
+import numpy as np
 
 from .controller import Controller
 from . import model
+from . import logs
+from .reports import format_float
 from http import HTTPStatus
 
 from imgui_bundle import imgui, hello_imgui, imgui_color_text_edit as ed, portable_file_dialogs as pfd
@@ -10,6 +13,11 @@ log = hello_imgui.log
 LogLevel = hello_imgui.LogLevel
 
 
+class HelloImguiSink(logs.Sink):
+    def log(self, level: logs.LogLevel, message: str) -> ():
+        log(getattr(LogLevel, level.name), message)
+
+
 class Editors:
     editors = {}
 
@@ -294,9 +302,15 @@ def read_only_request(request: model.HTTPRequest):
 
 
 def read_only_response(response: model.HTTPResponse) -> bool:
+    static = read_only_response
     if response is None:
+        static.pretty = None
         return False
 
+    # received bodies are only prettified once their popup is opened
+    if getattr(static, "pretty", None) is None or static.pretty[0] is not response:
+        static.pretty = (response, response.pretty_body())
+
     ret = False
 
     if not imgui.is_popup_open("Response"):
@@ -307,6 +321,10 @@ def read_only_response(response: model.HTTPResponse) -> bool:
         if imgui.begin_tab_bar("Response"):
             if imgui.begin_tab_item("Body")[0]:
                 imgui.text(f"Type: {response.body_type}")
+                if response.truncated:
+                    imgui.same_line()
+                    imgui.text_colored(imgui.ImVec4(255, 255, 0, 255),
+                                       f"Truncated, showing first {len(response.body)} characters of {'unknown' if response.length is None else response.length} bytes")
 
                 language = None
                 match response.body_type:
@@ -316,7 +334,7 @@ def read_only_response(response: model.HTTPResponse) -> bool:
                 imgui.push_id(0)
                 Editors.render_ed(
                     "RO Response body",
-                    response.body,
+                    static.pretty[1],
                     (-1, 250),
                     language)
 
@@ -400,6 +418,32 @@ def sqlinj_test(endpoint: model.Endpoint) -> ():
             imgui.tree_pop()
 
 
+def rate_limit_input(limit: model.RateLimit):
+    changed, limit.requests_per_second = imgui.input_float("Requests per second (0 for unlimited)", limit.requests_per_second)
+    if changed:
+        limit.requests_per_second = max(0, limit.requests_per_second)
+
+    changed, limit.burst = imgui.input_int("Burst", limit.burst)
+    if changed:
+        limit.burst = max(1, limit.burst)
+
+    changed, limit.max_in_flight = imgui.input_int("Max requests in flight (0 for unlimited)", limit.max_in_flight)
+    if changed:
+        limit.max_in_flight = max(0, limit.max_in_flight)
+
+
+def endpoint_rate_limit(endpoint: model.Endpoint):
+    changed, value = imgui.checkbox("Limit requests to host", endpoint.rate_limit is not None)
+    if changed:
+        endpoint.rate_limit = model.RateLimit() if value else None
+
+    if endpoint.rate_limit is not None:
+        imgui.same_line()
+        if imgui.tree_node("Details"):
+            rate_limit_input(endpoint.rate_limit)
+            imgui.tree_pop()
+
+
 def endpoint_vulnerabilities_input(endpoint: model.Endpoint):
     _, endpoint.match_test = imgui.checkbox("Basic input/output match test", endpoint.match_test)
     imgui.push_id("fuzz_test")
@@ -448,6 +492,14 @@ def edit_endpoint(endpoint: model.Endpoint, label: str) -> bool:
         changed, endpoint.max_wait_time = imgui.input_int("Max wait time (seconds)", endpoint.max_wait_time)
         if changed:
             endpoint.max_wait_time = max(1, endpoint.max_wait_time)
+
+        changed, endpoint.max_body_size = imgui.input_int("Max response size (bytes, 0 for no limit)", endpoint.max_body_size)
+        if changed:
+            endpoint.max_body_size = max(0, endpoint.max_body_size)
+
+        imgui.push_id("rate_limit")
+        endpoint_rate_limit(endpoint)
+        imgui.pop_id()
         
         if imgui.button("Save", (50, 30)):
             static.validation = endpoint.validate()
@@ -542,8 +594,59 @@ class TestInputWindow:
                 if self.controller.model.dynamic_options.use_initial_values:
                     partialdict_input(self.controller.model.dynamic_options.initial_cookies, "initial_cookies")
 
+                changed, self.controller.model.dynamic_options.virtual_users = imgui.input_int(f"Virtual users (in parallel, own cookies each, up to {model.MAX_VIRTUAL_USERS})", self.controller.model.dynamic_options.virtual_users)
+                if changed:
+                    self.controller.model.dynamic_options.virtual_users = model.clamp_virtual_users(self.controller.model.dynamic_options.virtual_users)
+
                 imgui.tree_pop()
 
+    def run_options(self):
+        options = self.controller.model.run_options
+
+        if imgui.tree_node("Run options"):
+            imgui.text("Engine")
+            for v in model.Engine:
+                imgui.same_line()
+                if imgui.radio_button(str(v), options.engine == v):
+                    options.engine = v
+
+            if options.engine == model.Engine.ASYNCIO:
+                changed, options.max_in_flight = imgui.input_int("Max requests in flight", options.max_in_flight)
+                if changed:
+                    options.max_in_flight = max(1, options.max_in_flight)
+
+            changed, options.payload_processes = imgui.input_int("Fuzz payload processes (0 for none)", options.payload_processes)
+            if changed:
+                options.payload_processes = max(0, options.payload_processes)
+
+            changed, options.wordlist_memory = imgui.input_int("Wordlist memory (MiB)", options.wordlist_memory)
+            if changed:
+                options.wordlist_memory = max(1, options.wordlist_memory)
+
+            _, options.result_database = imgui.input_text("Results database (empty to keep in memory only)", options.result_database)
+
+            changed, options.seed = imgui.input_int("Seed (0 for a new one every run)", options.seed)
+            if changed:
+                options.seed = max(0, options.seed)
+            if self.controller.seed is not None:
+                imgui.same_line()
+                imgui.text(f"Last run: {self.controller.seed}")
+
+            _, options.incremental = imgui.checkbox("Only test changed endpoints and ones that didn't pass", options.incremental)
+
+            _, options.adaptive_concurrency = imgui.checkbox("Adapt requests in flight to target latency and errors", options.adaptive_concurrency)
+
+            changed, value = imgui.checkbox("Default limit per host", options.rate_limit is not None)
+            if changed:
+                options.rate_limit = model.RateLimit() if value else None
+
+            if options.rate_limit is not None:
+                imgui.push_id("default_rate_limit")
+                rate_limit_input(options.rate_limit)
+                imgui.pop_id()
+
+            imgui.tree_pop()
+
     def filter(self):
         if imgui.button("Filter Tests", (0, 30)):
             self.endpoint_filter = EndpointFilterInput(self)
@@ -575,6 +678,8 @@ class TestInputWindow:
 
         self.dynamic_testing()
 
+        self.run_options()
+
         self.endpoint_table()
 
         if edit_endpoint(self.endpoint_edit, "Editing Test"):
@@ -598,50 +703,77 @@ class TestInputWindow:
             imgui.table_setup_column("Actions", imgui.TableColumnFlags_.none)
             imgui.table_headers_row()
 
-            i = 0  # For button ids
-            for ep in self.controller.endpoints():
-                imgui.push_id(f"endpoints##{i}")
-                if imgui.table_next_column():
-                    if not hasattr(ep, "enabled"):
-                        ep.enabled = True  # for files previous version
+            endpoints = self.controller.endpoints()
+            clipper = imgui.ListClipper()
+            clipper.begin(len(endpoints))
+            while clipper.step():
+                for i in range(clipper.display_start, min(clipper.display_end, len(endpoints))):  # rows can be deleted
+                    self.endpoint_row(endpoints[i], i)
 
-                    _, ep.enabled = imgui.checkbox("##enabled", ep.enabled)
-                if imgui.table_next_column():
-                    imgui.set_next_item_width(-1)
-                    _, ep.url = imgui.input_text("##url", ep.url)
+            imgui.end_table()
 
-                if imgui.table_next_column():
-                    imgui.text(ep.http_type())
-                
-                if imgui.table_next_column():
-                    imgui.text(ep.test_types())
-                
-                if imgui.table_next_column():
-                    width = imgui.get_column_width()
-                    if imgui.button("Edit", (width / 2 - 5, 0)):
-                        self.endpoint_edit = ep
-                    imgui.same_line()
-                    if imgui.button("Delete", (width / 2 - 5, 0)):
-                        self.controller.remove_endpoint(ep)
-                imgui.pop_id()
-                i += 1
+    def endpoint_row(self, ep: model.Endpoint, i: int):
+        imgui.table_next_row()
+        imgui.push_id(f"endpoints##{i}")
+        if imgui.table_next_column():
+            _, ep.enabled = imgui.checkbox("##enabled", ep.enabled)
+        if imgui.table_next_column():
+            imgui.set_next_item_width(-1)
+            _, ep.url = imgui.input_text("##url", ep.url)
+
+        if imgui.table_next_column():
+            imgui.text(ep.http_type())
+
+        if imgui.table_next_column():
+            imgui.text(ep.test_types())
+
+        if imgui.table_next_column():
+            width = imgui.get_column_width()
+            if imgui.button("Edit", (width / 2 - 5, 0)):
+                self.endpoint_edit = ep
+            imgui.same_line()
+            if imgui.button("Delete", (width / 2 - 5, 0)):
+                self.controller.remove_endpoint(ep)
+        imgui.pop_id()
 
-            imgui.end_table()
+
+class ResultRow:
+    # display strings of a result, results don't change once they're in the log
+    def __init__(self, result: model.TestResult):
+        self.severity = str(result.severity)
+        self.color = result.color()
+        self.elapsed = str(result.elapsed_time)
+        self.error = str(result.error)
+        self.run = "-" if result.run is None else str(result.run)
+        self.user = "-" if result.user is None else str(result.user)
+        self.fuzzed = result.diff_request is not result.endpoint.interaction.request
 
 
 class TestResultsWindow:
     def __init__(self, parent):
         self.controller = parent.controller
 
+        self.rows = []  # ResultRow for each filtered result, made when first shown
+        self.rows_source = None
+
         self.endpoint_edit = None
         self.request_details = None
         self.response_details = None
 
         self.result_filter = None
 
+    def row(self, results: list[model.TestResult], index: int) -> ResultRow:
+        if self.rows_source is not results:  # filter changed, controller made a new list
+            self.rows_source = results
+            self.rows = []
+        if len(self.rows) < len(results):
+            self.rows.extend([None] * (len(results) - len(self.rows)))
+        if self.rows[index] is None:
+            self.rows[index] = ResultRow(results[index])
+        return self.rows[index]
+
     def results_table(self):
-        i = 0  # For button ids
-        if imgui.begin_table("Results", 6, View.table_flags, (0, -1)):
+        if imgui.begin_table("Results", 8, View.table_flags, (0, -1)):
             imgui.table_setup_scroll_freeze(0, 1)
             imgui.table_setup_column("URL", imgui.TableColumnFlags_.none)
             imgui.table_setup_column("Severity", imgui.TableColumnFlags_.none)
@@ -649,54 +781,62 @@ class TestResultsWindow:
             imgui.table_setup_column("Response", imgui.TableColumnFlags_.none)
             imgui.table_setup_column("Elapsed time", imgui.TableColumnFlags_.none)
             imgui.table_setup_column("Error", imgui.TableColumnFlags_.none)
+            imgui.table_setup_column("Run", imgui.TableColumnFlags_.none)
+            imgui.table_setup_column("User", imgui.TableColumnFlags_.none)
             imgui.table_headers_row()
 
-            for tr in self.controller.test_results():
-                if imgui.table_next_column():
-                    imgui.push_id(i + 0)
-                    imgui.input_text("", tr.endpoint.url, imgui.InputTextFlags_.read_only)
-                    imgui.pop_id()
+            # only visible rows are submitted, frame time doesn't grow with results
+            results = self.controller.test_results()
+            clipper = imgui.ListClipper()
+            clipper.begin(len(results))
+            while clipper.step():
+                for i in range(clipper.display_start, clipper.display_end):
+                    tr = results[i]
+                    row = self.row(results, i)
+                    imgui.table_next_row()
+                    imgui.push_id(i)
 
-                    imgui.same_line()
-                    imgui.text(tr.endpoint.http_type())
+                    if imgui.table_next_column():
+                        imgui.input_text("##url", tr.endpoint.url, imgui.InputTextFlags_.read_only)
 
-                    imgui.same_line()
-                    imgui.push_id(i + 1)
-                    if imgui.button("Edit"):
-                        self.endpoint_edit = tr.endpoint
-                    imgui.pop_id()
+                        imgui.same_line()
+                        imgui.text(tr.endpoint.http_type())
 
-                    if id(tr.endpoint.interaction.request) != id(tr.diff_request):
-                        imgui.push_id(i + 2)
                         imgui.same_line()
-                        if imgui.button("Request details"):
-                            self.request_details = tr.diff_request
-                        imgui.pop_id()
-                      
-                if imgui.table_next_column():
-                    imgui.text_colored(tr.color(), str(tr.severity))
-                  
-                if imgui.table_next_column():
-                    imgui.text(tr.verdict)
-                  
-                if imgui.table_next_column():
-                    if tr.response is None:
-                        imgui.text("None")
-                    else:
-                        imgui.push_id(i + 3)
-                        if imgui.button("Details", (-1, 0)):
+                        if imgui.button("Edit"):
+                            self.endpoint_edit = tr.endpoint
+
+                        if row.fuzzed:
+                            imgui.same_line()
+                            if imgui.button("Request details"):
+                                self.request_details = tr.diff_request
+
+                    if imgui.table_next_column():
+                        imgui.text_colored(row.color, row.severity)
+
+                    if imgui.table_next_column():
+                        imgui.text(tr.verdict)
+
+                    if imgui.table_next_column():
+                        if tr.response is None:
+                            imgui.text("None")
+                        elif imgui.button("Details", (-1, 0)):
                             self.response_details = tr.response
-                        imgui.pop_id()
 
-                if imgui.table_next_column():
-                    imgui.text(str(tr.elapsed_time))
-  
-                if imgui.table_next_column():
-                    imgui.push_id(i + 4)
-                    imgui.set_next_item_width(-1)
-                    imgui.input_text("", str(tr.error), imgui.InputTextFlags_.read_only)
+                    if imgui.table_next_column():
+                        imgui.text(row.elapsed)
+
+                    if imgui.table_next_column():
+                        imgui.set_next_item_width(-1)
+                        imgui.input_text("##error", row.error, imgui.InputTextFlags_.read_only)
+
+                    if imgui.table_next_column():
+                        imgui.text(row.run)
+
+                    if imgui.table_next_column():
+                        imgui.text(row.user)
+
                     imgui.pop_id()
-                i += 5
             imgui.end_table()
 
             if read_only_response(self.response_details):
@@ -706,11 +846,44 @@ class TestResultsWindow:
             if edit_endpoint(self.endpoint_edit, "Editing endpoint"):
                 self.endpoint_edit = None
 
+    def latency_table(self):
+        def text_time(num: float):
+            imgui.text("-" if num is None else format_float(num))
+
+        stats = self.controller.metrics.stats()
+        if imgui.begin_table("Latency", 8, View.table_flags, (0, min(len(stats) + 1, 8) * imgui.get_frame_height_with_spacing())):
+            imgui.table_setup_scroll_freeze(0, 1)
+            for name in ["Endpoint", "Requests", "Errors", "p50", "p90", "p99", "Max", "Requests/s"]:
+                imgui.table_setup_column(name, imgui.TableColumnFlags_.none)
+            imgui.table_headers_row()
+
+            for row in stats:
+                if imgui.table_next_column():
+                    imgui.text(row.name)
+                if imgui.table_next_column():
+                    imgui.text(str(row.count))
+                if imgui.table_next_column():
+                    imgui.text(str(row.errors))
+                if imgui.table_next_column():
+                    text_time(row.p50)
+                if imgui.table_next_column():
+                    text_time(row.p90)
+                if imgui.table_next_column():
+                    text_time(row.p99)
+                if imgui.table_next_column():
+                    text_time(row.max)
+                if imgui.table_next_column():
+                    imgui.text("-" if row.throughput is None else f"{row.throughput:.1f}")
+            imgui.end_table()
+
     def gui(self):
         if self.controller.model.endpoints != []:
             if not self.controller.in_progress:
                 if imgui.button("Test", (50, 30)):
                     self.controller.start_testing()
+                imgui.same_line()
+                if imgui.button("Replay Critical", (0, 30)):
+                    self.controller.start_replay()
             else:
                 if imgui.button("Cancel", (50, 30)):
                     self.controller.cancel_testing()
@@ -733,6 +906,10 @@ class TestResultsWindow:
 
                 imgui.tree_pop()
 
+        if len(self.controller.model.results) > 0 and imgui.tree_node("Latency"):
+            self.latency_table()
+            imgui.tree_pop()
+
         self.results_table()
         
 
@@ -740,6 +917,8 @@ class View:
     table_flags = imgui.TableFlags_.scroll_y | imgui.TableFlags_.row_bg | imgui.TableFlags_.borders_outer | imgui.TableFlags_.borders_v | imgui.TableFlags_.resizable | imgui.TableFlags_.reorderable | imgui.TableFlags_.hideable
 
     def __init__(self, controller: Controller = Controller()):
+        logs.set_sinks([HelloImguiSink()])
+
         self.controller = controller
         self.tests = TestInputWindow(self)
         self.results = TestResultsWindow(self)
@@ -747,6 +926,7 @@ class View:
         self.file_save = None
         self.file_open = None
         self.file_export = None
+        self.file_open_results = None
 
     def status_bar(self):
         if self.controller.in_progress:
@@ -757,24 +937,36 @@ class View:
             imgui.same_line()
             imgui.progress_bar(self.controller.progress, (1000, 15))
 
+            concurrency = self.controller.concurrency
+            if concurrency is not None:
+                imgui.same_line()
+                imgui.text(f"Concurrency: {concurrency.current()}")
+                imgui.same_line()
+                imgui.plot_lines("##concurrency", np.array(concurrency.timeline(), dtype=np.float32),
+                                 scale_min=0, graph_size=(200, 15))
+
     def menu(self):
         if imgui.begin_menu("File"):
-            if imgui.menu_item("Save", "Ctrl+S", False)[0]:
+            saving = self.controller.saving()  # the model can't be replaced while it's written
+            if imgui.menu_item("Save", "Ctrl+S", False, not saving)[0]:
                 self.file_save = pfd.save_file("Select where to save", "", ["*.wt"])
 
-            if imgui.menu_item("Open", "Ctrl+O", False)[0]:
+            if imgui.menu_item("Open", "Ctrl+O", False, not saving)[0]:
                 self.file_open = pfd.open_file("Open a save", "", ["*.wt"])
 
+            if imgui.menu_item("Open results database", "", False, not saving)[0]:
+                self.file_open_results = pfd.open_file("Open results written during a run", "", ["*.db"])
+
             imgui.separator()
             
-            if imgui.menu_item("Export results", "", False, self.controller.model.results != [])[0]:
+            if imgui.menu_item("Export results", "", False, len(self.controller.model.results) > 0)[0]:
                 self.file_export = pfd.save_file("Select where to export", "", ["*.docx"])
 
             imgui.end_menu()
 
         if self.file_save is not None and self.file_save.ready():
             if self.file_save.result() is not None and self.file_save.result() != "":
-                self.controller.save(self.file_save.result())
+                self.controller.start_save(self.file_save.result())
                 self.file_save = None
 
         if self.file_open is not None and self.file_open.ready():
@@ -782,6 +974,11 @@ class View:
                 self.controller.open(self.file_open.result()[0])
                 self.file_open = None
 
+        if self.file_open_results is not None and self.file_open_results.ready():
+            if self.file_open_results.result() is not None and self.file_open_results.result() != []:
+                self.controller.open_results(self.file_open_results.result()[0])
+                self.file_open_results = None
+
         if self.file_export is not None and self.file_export.ready():
             if self.file_export.result() is not None and self.file_export.result() != "":
                 self.controller.export(self.file_export.result())
@@ -0,0 +1,216 @@
+from array import array
+from collections import OrderedDict
+from concurrent import futures
+
+import hashlib
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+
+from .logs import log, LogLevel
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"WTIX"
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct("<4sIQQ")  # magic, version, size and mtime of the wordlist it was built from
+NEWLINE = re.compile(rb"\r\n?|\n")
+
+
+def line_offsets(data) -> array:
+    # start of every line and the end of data. lines end like in text mode readlines: \n, \r\n or a lone \r,
+    # and a last line without newline counts
+    ret = array("Q", [0])
+    ret.extend(map(lambda match: match.end(), NEWLINE.finditer(data)))
+    if ret[-1] != len(data):
+        ret.append(len(data))
+    return ret
+
+
+def index_directory() -> str:
+    # indexes don't go next to the wordlists, those are often in a submodule or a read-only install
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "web_tester", "wordlists")
+
+
+def index_path(filename: str) -> str:
+    key = hashlib.blake2b(os.fsencode(os.path.abspath(filename)), digest_size=16).hexdigest()
+    return os.path.join(index_directory(), key + INDEX_SUFFIX)
+
+
+def index_header(stat: os.stat_result) -> bytes:
+    return INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+class MappedWordlist:
+    # lines of a memory mapped file, found through an offset index that's cached in the user's cache directory.
+    # processes mapping the same file share its pages, only the lines used become str objects
+    def __init__(self, filename: str) -> ():
+        self.filename = filename
+        self.data = b""
+        self.index = None  # mapped index file, None if offsets are only in memory
+        self.offsets = array("Q", [0])
+
+        with open(filename, "rb") as file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size > 0:
+                self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if stat.st_size > 0:
+            self.load_index(stat)
+
+    def load_index(self, stat: os.stat_result) -> ():
+        header = index_header(stat)
+        filename = index_path(self.filename)
+        try:
+            with open(filename, "rb") as file:
+                if file.read(len(header)) == header:
+                    self.index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.offsets = memoryview(self.index)[len(header):].cast("Q")
+                    return
+        except (OSError, ValueError, TypeError):  # missing, or cut short
+            if self.index is not None:
+                self.index.close()
+                self.index = None
+
+        self.offsets = line_offsets(self.data)
+        temporary = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"  # other processes may build it too
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(temporary, "wb") as file:
+                file.write(header)
+                self.offsets.tofile(file)
+            os.replace(temporary, filename)
+        except OSError as e:  # no usable cache directory, index is rebuilt next time
+            log(LogLevel.debug, f"Couldn't cache wordlist index {filename}: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("wordlist index out of range")
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode("utf-8", errors="replace").strip()
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def sample(self, rand: random.Random = random) -> str:
+        return self[rand.randrange(len(self))]
+
+    def memory(self) -> int:  # bytes mapped or held for the index
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+    def warm(self) -> ():
+        # reads every page once so sampling never waits for the disk
+        for data in (self.data, self.index):
+            if not isinstance(data, mmap.mmap):
+                continue
+            if hasattr(mmap, "MADV_WILLNEED"):
+                data.madvise(mmap.MADV_WILLNEED)
+            sum(data[i] for i in range(0, len(data), mmap.PAGESIZE))
+
+    def close(self) -> ():
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        for mapped in (self.index, self.data):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __reduce__(self):  # other processes map the file themselves
+        return (MappedWordlist, (self.filename,))
+
+
+class CacheStats:
+    def __init__(self, hits: int = 0, misses: int = 0, evictions: int = 0):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+
+    def __sub__(self, other):  # -> CacheStats:
+        return CacheStats(self.hits - other.hits, self.misses - other.misses, self.evictions - other.evictions)
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+class WordlistCache:
+    # mapped wordlists by filename, least recently used ones are dropped once they take more than
+    # `budget` bytes. dropped wordlists are unmapped when nothing uses them anymore
+    def __init__(self, budget: int = 256 * 1024 * 1024) -> ():
+        self.budget = budget
+        self.items = OrderedDict()
+        self.size = 0
+        self.loading = {}  # filename -> Future, so a file is only opened once
+        self.lock = threading.Lock()
+        self.counts = CacheStats()
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return CacheStats(self.counts.hits, self.counts.misses, self.counts.evictions)
+
+    def get(self, filename: str, warm: bool = False) -> MappedWordlist:
+        with self.lock:
+            if filename in self.items:
+                self.items.move_to_end(filename)
+                self.counts.hits += 1
+                return self.items[filename]
+
+            self.counts.misses += 1
+            if filename in self.loading:
+                pending, owner = self.loading[filename], False
+            else:
+                pending, owner = self.loading.setdefault(filename, futures.Future()), True
+
+        if not owner:
+            return pending.result()
+
+        try:
+            wordlist = MappedWordlist(filename)
+            if warm:
+                wordlist.warm()
+        except Exception as e:
+            with self.lock:
+                del self.loading[filename]
+            pending.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[filename]
+            self.items[filename] = wordlist
+            self.size += wordlist.memory()
+            self.shrink()
+        pending.set_result(wordlist)
+        return wordlist
+
+    def shrink(self) -> ():  # with lock held, the newest wordlist stays even over budget
+        while self.size > self.budget and len(self.items) > 1:
+            _, wordlist = self.items.popitem(last=False)
+            self.size -= wordlist.memory()
+            self.counts.evictions += 1
+
+    def resize(self, budget: int) -> ():
+        with self.lock:
+            self.budget = budget
+            self.shrink()
+
+    def remove(self, filename: str) -> ():
+        with self.lock:
+            if filename in self.items:
+                self.size -= self.items.pop(filename).memory()
+
+    def preload(self, filenames: list[str]) -> threading.Thread:
+        # maps and reads files in the background, errors show up again when the wordlist is used
+        def load():
+            for filename in filenames:
+                try:
+                    self.get(filename, warm=True)
+                except Exception as e:
+                    log(LogLevel.warning, f"Failed preloading wordlist {filename}: {str(e)}")
+
+        ret = threading.Thread(target=load, name="wordlist-preload", daemon=True)
+        ret.start()
+        return ret